@@ -0,0 +1,50 @@
+"""Recall vs. latency of the approximate VectorStore index types against the exact flat baseline."""
+import sys
+import time
+import argparse
+
+import faiss
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+from ann import build_index, set_search_parameters
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--num_vectors', type=int, default=100000)
+parser.add_argument('--num_queries', type=int, default=1000)
+parser.add_argument('--dimension', type=int, default=384) # all-MiniLM-L6-v2
+parser.add_argument('--k', type=int, default=10)
+args = parser.parse_args()
+
+# Clustered synthetic unit vectors, closer to real embeddings than uniform noise
+rng = np.random.default_rng(0)
+centers = rng.standard_normal((200, args.dimension), dtype=np.float32)
+def sample(n):
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, args.dimension), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+vectors, queries = sample(args.num_vectors), sample(args.num_queries)
+
+def run(index):
+    start = time.perf_counter()
+    _, indices = index.search(queries, args.k)
+    return indices, (time.perf_counter() - start) / len(queries) * 1000
+
+flat = build_index("flat", vectors)
+ground_truth, flat_latency = run(flat)
+
+print(f"{'index':>10} | {'param':>14} | {'build (s)':>9} | {'recall@' + str(args.k):>9} | {'ms/query':>8}")
+print(f"{'flat':>10} | {'-':>14} | {'-':>9} | {1.0:>9.3f} | {flat_latency:>8.3f}")
+for index_type, parameter, values in [
+    ("hnsw", "ef_search", [16, 32, 64, 128, 256]),
+    ("ivf_flat", "nprobe", [1, 4, 16, 64]),
+    ("ivf_pq", "nprobe", [1, 4, 16, 64]),
+]:
+    start = time.perf_counter()
+    index = build_index(index_type, vectors)
+    build_time = time.perf_counter() - start
+    for value in values:
+        set_search_parameters(index, **{parameter: value})
+        indices, latency = run(index)
+        recall = np.mean([len(set(found) & set(expected)) / args.k for found, expected in zip(indices, ground_truth)])
+        print(f"{index_type:>10} | {f'{parameter}={value}':>14} | {build_time:>9.2f} | {recall:>9.3f} | {latency:>8.3f}")
@@ -0,0 +1,58 @@
+"""Throughput and latency of many threads encoding small batches, per-call vs. through the micro-batching encoder."""
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+import main_v2 as main
+from encoders import BatchingEncoder, get_encoder
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--model', type=str, default=main.EMBEDDING_MODEL)
+parser.add_argument('--num_threads', type=int, nargs='+', default=[1, 4, 16, 32])
+parser.add_argument('--requests_per_thread', type=int, default=20)
+parser.add_argument('--max_batch_size', type=int, default=64)
+parser.add_argument('--max_wait', type=float, default=0.005) # Seconds
+args = parser.parse_args()
+
+random.seed(0)
+VOCAB = "the economy jobs record million growth rate inflation wages border claim senator percent year report data".split()
+def make_request():
+    """1-10 sentences, like the queries and snippets of one claim component."""
+    return [" ".join(random.choices(VOCAB, k=random.randint(8, 40))) for _ in range(random.randint(1, 10))]
+
+encoder = get_encoder(args.model)
+encoder.encode(make_request()) # Warm up
+
+def run(encode, num_threads):
+    requests = [[make_request() for _ in range(args.requests_per_thread)] for _ in range(num_threads)]
+    latencies = []
+    def worker(thread_requests):
+        for sentences in thread_requests:
+            start = time.perf_counter()
+            encode(sentences)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        list(executor.map(worker, requests))
+    elapsed = time.perf_counter() - start
+    num_sentences = sum(len(sentences) for thread_requests in requests for sentences in thread_requests)
+    return num_sentences / elapsed, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 95) * 1000
+
+print(f"{'threads':>7} | {'mode':>9} | {'sentences/s':>11} | {'p50 ms':>8} | {'p95 ms':>8} | {'batches':>7} | {'sentences/batch':>15} | {'max queue':>9}")
+for num_threads in args.num_threads:
+    throughput, p50, p95 = run(encoder.encode, num_threads)
+    print(f"{num_threads:>7} | {'per-call':>9} | {throughput:>11.0f} | {p50:>8.1f} | {p95:>8.1f} | {'-':>7} | {'-':>15} | {'-':>9}")
+
+    batching_encoder = BatchingEncoder(encoder, max_batch_size=args.max_batch_size, max_wait=args.max_wait)
+    throughput, p50, p95 = run(batching_encoder.encode, num_threads)
+    stats = batching_encoder.stats()
+    print(
+        f"{num_threads:>7} | {'batched':>9} | {throughput:>11.0f} | {p50:>8.1f} | {p95:>8.1f} | {stats['batches']:>7} | "
+        f"{stats['mean_batch_sentences']:>15.1f} | {stats['max_queue_depth']:>9}"
+    )
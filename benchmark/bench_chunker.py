@@ -0,0 +1,73 @@
+"""Chunking throughput on large pages: offset-based sliding-window chunker vs. the previous string-concatenating chunk_text."""
+import re
+import sys
+import csv
+import time
+import random
+import argparse
+
+sys.path.append('../pipeline_v2/')
+from utils import chunk_spans, chunk_text, iter_chunk_spans
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--data', type=str, default='../data/pilot_updated_v3.csv')
+parser.add_argument('--page_sizes', type=float, nargs='+', default=[0.1, 1, 5]) # MB
+parser.add_argument('--max_chunk_size', type=int, default=1000)
+parser.add_argument('--max_overlap', type=int, default=100)
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+def legacy_chunk_text(text, max_chunk_size=1000, max_overlap=200):
+    """Previous implementation: chunks grown by string concatenation, overlap found by re-splitting each finished chunk."""
+    def _split_into_sentences(text): return re.split(r'(?<=[.!?])\s+', text)
+    sentences = _split_into_sentences(text)
+    chunks, current_chunk, overlap = [], "", ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) <= max_chunk_size:
+            current_chunk += sentence + " "
+        else:
+            chunks.append(current_chunk.strip())
+            overlap = ""
+            chunk_sentences = _split_into_sentences(current_chunk)
+            for s in reversed(chunk_sentences):
+                if len(overlap) + len(s) > max_overlap:
+                    break
+                overlap = s + " " + overlap
+            current_chunk = overlap + sentence + " "
+    if current_chunk.strip(): chunks.append(current_chunk.strip())
+    return chunks
+
+# Pages built from the pilot set's statements and fact-check reasoning, with paragraph breaks like scraped articles
+random.seed(0)
+with open(args.data) as f:
+    paragraphs = [" ".join(filter(None, (row["statement"], row["context"], row["Reasoning"]))) for row in csv.DictReader(f)]
+def make_page(num_bytes):
+    parts, size = [], 0
+    while size < num_bytes:
+        parts.append(random.choice(paragraphs))
+        size += len(parts[-1]) + 2
+    return "\n\n".join(parts)
+
+def best_time(function):
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+print(f"{'page MB':>7} | {'legacy ms':>9} | {'chunk_text ms':>13} | {'spans ms':>8} | {'speedup':>7} | {'chunks':>13} | {'same text':>9} | {'max len':>7}")
+for page_size in args.page_sizes:
+    page = make_page(int(page_size * 2**20))
+    legacy_time, legacy_chunks = best_time(lambda: legacy_chunk_text(page, args.max_chunk_size, args.max_overlap))
+    text_time, chunks = best_time(lambda: chunk_text(page, args.max_chunk_size, args.max_overlap))
+    spans_time, spans = best_time(lambda: chunk_spans(page, args.max_chunk_size, args.max_overlap))
+    assert spans == list(iter_chunk_spans(page, args.max_chunk_size, args.max_overlap))
+
+    # Chunks now keep the page's own whitespace, so compare them with whitespace collapsed like the legacy chunker's output
+    legacy_set = set(legacy_chunks)
+    same_text = sum(" ".join(chunk.split()) in legacy_set for chunk in chunks) / len(chunks)
+    print(
+        f"{page_size:>7} | {legacy_time * 1000:>9.1f} | {text_time * 1000:>13.1f} | {spans_time * 1000:>8.1f} | {legacy_time / spans_time:>6.1f}x | "
+        f"{len(legacy_chunks):>6}/{len(chunks):>6} | {same_text:>9.1%} | {max(end - start for start, end in spans):>7}"
+    )
@@ -0,0 +1,62 @@
+"""Parity (cosine agreement, top-k overlap on a PyTorch-built index) and throughput of the ONNX Runtime encoder backends against PyTorch on CPU."""
+import sys
+import csv
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+import main_v2 as main
+from ann import build_index
+from encoders import get_encoder
+from utils import chunk_text
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--model', type=str, default=main.EMBEDDING_MODEL)
+parser.add_argument('--backends', type=str, nargs='+', default=["onnx", "onnx-int8"])
+parser.add_argument('--data', type=str, default='../data/pilot_updated_v3.csv')
+parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 8, 32])
+parser.add_argument('--num_sentences', type=int, default=512)
+parser.add_argument('--k', type=int, default=10)
+parser.add_argument('--min_cosine', type=float, default=0.99) # Parity threshold on the mean cosine similarity to PyTorch embeddings
+args = parser.parse_args()
+
+# Statements and fact-check context from the pilot set, chunked like retrieved web pages
+with open(args.data) as f:
+    texts = [" ".join(filter(None, (row["statement"], row["context"], row["Reasoning"]))) for row in csv.DictReader(f)]
+sentences = [chunk for text in texts for chunk in chunk_text(text, 1000, 100)]
+sentences = (sentences * (args.num_sentences // max(len(sentences), 1) + 1))[:args.num_sentences]
+queries = [text[:200] for text in texts[:100]]
+
+def throughput(encoder, batch_size):
+    encoder.encode(sentences[:batch_size], batch_size=batch_size) # Warm up
+    start = time.perf_counter()
+    encoder.encode(sentences, batch_size=batch_size)
+    return len(sentences) / (time.perf_counter() - start)
+
+torch_encoder = get_encoder(args.model)
+reference = torch_encoder.encode(sentences, convert_to_numpy=True, normalize_embeddings=True)
+reference_index = build_index("flat", reference, np.arange(len(sentences)))
+reference_results = reference_index.search(torch_encoder.encode(queries, normalize_embeddings=True), args.k)[1]
+
+print(f"{'backend':>10} | {'mean cosine':>11} | {'min cosine':>10} | {'top-' + str(args.k) + ' overlap':>14} | " + " | ".join(f"{'batch ' + str(b) + ' sent/s':>15}" for b in args.batch_sizes))
+print(f"{'torch':>10} | {1.0:>11.4f} | {1.0:>10.4f} | {1.0:>14.3f} | " + " | ".join(f"{throughput(torch_encoder, b):>15.1f}" for b in args.batch_sizes))
+failed = []
+for backend in args.backends:
+    encoder = get_encoder(args.model, backend=backend)
+    embeddings = encoder.encode(sentences, convert_to_numpy=True, normalize_embeddings=True)
+    cosines = np.sum(embeddings * reference, axis=1)
+
+    # Queries encoded by the backend against the index built from PyTorch embeddings
+    results = reference_index.search(encoder.encode(queries, normalize_embeddings=True), args.k)[1]
+    overlap = np.mean([len(set(found) & set(expected)) / args.k for found, expected in zip(results, reference_results)])
+
+    print(
+        f"{backend:>10} | {cosines.mean():>11.4f} | {cosines.min():>10.4f} | {overlap:>14.3f} | "
+        + " | ".join(f"{throughput(encoder, b):>15.1f}" for b in args.batch_sizes)
+    )
+    if cosines.mean() < args.min_cosine: failed.append(backend)
+
+if failed: print(f"Parity check failed (mean cosine < {args.min_cosine}): {', '.join(failed)}")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,67 @@
+"""Throughput (pages/s) and tokens kept per page of the boilerplate-stripping HTML extractor vs. the BeautifulSoup extractor of utils/web_utils."""
+import os
+import re
+import sys
+import time
+import argparse
+
+import numpy as np
+from bs4 import BeautifulSoup
+
+sys.path.append('../pipeline_v2/')
+import main_v2 as main
+from encoders import get_encoder
+from fetcher import PageFetcher
+from html_extract import extract_text
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--pages_dir', type=str, default='../data/html/') # Saved pages (*.html), one per file
+parser.add_argument('--urls', type=str, default=None) # Optional file of URLs (one per line) to download into pages_dir first
+parser.add_argument('--model', type=str, default=main.EMBEDDING_MODEL) # Tokenizer used to count tokens
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+def legacy_extract(html):
+    """Extraction of utils/web_utils.scrape_text_from_website (html.parser, all visible text)."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    return re.sub(r'\s+', ' ', soup.get_text()).strip()
+
+# Download pages to build the corpus, keeping the raw HTML
+if args.urls:
+    os.makedirs(args.pages_dir, exist_ok=True)
+    with open(args.urls) as f:
+        urls = [line.strip() for line in f if line.strip()]
+    fetcher = PageFetcher(timeout=10, extract=lambda html: html)
+    for i, (url, html) in enumerate(fetcher.fetch_many(urls)):
+        with open(os.path.join(args.pages_dir, f"{i:05d}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+    fetcher.close()
+
+pages = []
+for name in sorted(os.listdir(args.pages_dir)):
+    if name.endswith((".html", ".htm")):
+        with open(os.path.join(args.pages_dir, name), "rb") as f:
+            pages.append(f.read())
+megabytes = sum(len(page) for page in pages) / 2**20
+print(f"{len(pages)} pages, {megabytes:.1f} MB of HTML")
+
+tokenizer = get_encoder(args.model).tokenizer
+def num_tokens(texts):
+    return np.array([len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]])
+
+print(f"{'extractor':>10} | {'pages/s':>8} | {'MB/s':>6} | {'tokens/page':>11} | {'median tokens/page':>18} | {'tokens kept':>11}")
+baseline_tokens = None
+for name, extract in [("legacy", legacy_extract), ("lxml", extract_text)]:
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        texts = [extract(page) for page in pages]
+        times.append(time.perf_counter() - start)
+    tokens = num_tokens(texts)
+    if baseline_tokens is None: baseline_tokens = tokens.sum()
+    print(
+        f"{name:>10} | {len(pages) / min(times):>8.1f} | {megabytes / min(times):>6.1f} | {tokens.mean():>11.0f} | "
+        f"{np.median(tokens):>18.0f} | {tokens.sum() / baseline_tokens:>11.1%}"
+    )
@@ -0,0 +1,90 @@
+"""Peak memory of handing a large batch of embeddings from the encoder to FAISS: tensor round trip vs. zero-copy float32 arrays."""
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import tracemalloc
+
+import faiss
+import psutil
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+import main_v2 as main
+from ann import build_index
+from encoders import encode_float32, get_encoder
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--model', type=str, default=main.EMBEDDING_MODEL)
+parser.add_argument('--num_chunks', type=int, nargs='+', default=[10000, 50000])
+parser.add_argument('--chunk_words', type=int, default=20) # Short chunks keep the benchmark about embedding buffers rather than activations
+parser.add_argument('--mode', type=str, default=None) # Internal: run one measurement in this process
+args = parser.parse_args()
+
+def legacy_ingest(encoder, chunks):
+    """Previous path: stacked torch tensor -> numpy, normalized, gathered into a new array for the deduplicated rows."""
+    embeddings = encoder.encode(chunks, convert_to_tensor=True).cpu().numpy()
+    faiss.normalize_L2(embeddings)
+    new_embeddings = embeddings[list(range(len(embeddings)))]
+    return build_index("flat", new_embeddings, np.arange(len(chunks)))
+
+def zero_copy_ingest(encoder, chunks):
+    """Current path (VectorStore.add_documents): batches written into one float32 array, normalized in place and indexed as is."""
+    embeddings = encode_float32(encoder, chunks, batch_size=main.ENCODE_BATCH_SIZE)
+    faiss.normalize_L2(embeddings)
+    return build_index("flat", embeddings, np.arange(len(chunks)))
+
+def measure(mode, num_chunks):
+    """Peak RSS (sampled every millisecond) and peak traced allocations above the baseline after loading the model."""
+    rng = np.random.default_rng(0)
+    vocab = "the economy jobs record million growth rate inflation wages border claim senator percent year report data".split()
+    chunks = [" ".join(rng.choice(vocab, args.chunk_words)) + f" {i}" for i in range(num_chunks)]
+    encoder = get_encoder(args.model)
+    encoder.encode(chunks[:64]) # Warm up
+
+    process = psutil.Process()
+    baseline = process.memory_info().rss
+    peak = [baseline]
+    done = threading.Event()
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], process.memory_info().rss)
+            time.sleep(0.001)
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = (legacy_ingest if mode == "legacy" else zero_copy_ingest)(encoder, chunks)
+    elapsed = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    done.set()
+    sampler.join()
+    peak[0] = max(peak[0], process.memory_info().rss)
+    return {
+        "peak_rss_mb": (peak[0] - baseline) / 2**20,
+        "traced_peak_mb": traced_peak / 2**20,
+        "index_mb": index.ntotal * index.d * 4 / 2**20,
+        "seconds": elapsed,
+    }
+
+if args.mode is not None:
+    print(json.dumps(measure(args.mode, args.num_chunks[0])))
+    sys.exit(0)
+
+# Each measurement runs in a fresh process so memory freed by one run cannot hide the peak of the next
+print(f"{'chunks':>8} | {'path':>9} | {'peak RSS MB':>11} | {'traced peak MB':>14} | {'index MB':>8} | {'seconds':>7}")
+for num_chunks in args.num_chunks:
+    for mode in ["legacy", "zero_copy"]:
+        output = subprocess.run(
+            [sys.executable, __file__, '--model', args.model, '--num_chunks', str(num_chunks), '--chunk_words', str(args.chunk_words), '--mode', mode],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{num_chunks:>8} | {mode:>9} | {result['peak_rss_mb']:>11.1f} | {result['traced_peak_mb']:>14.1f} | "
+            f"{result['index_mb']:>8.1f} | {result['seconds']:>7.2f}"
+        )
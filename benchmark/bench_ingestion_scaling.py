@@ -0,0 +1,65 @@
+"""Scaling of document ingestion (chunking, hashing, SimHash, tokenization) across worker processes, and the small-input fallback."""
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+
+sys.path.append('../pipeline_v2/')
+import main_v2 as main
+from ingestion import chunk_documents, get_process_pool, iter_chunked_documents
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--model', type=str, default=main.EMBEDDING_MODEL) # Tokenizer for token chunking
+parser.add_argument('--data', type=str, default='../data/pilot_updated_v3.csv')
+parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+parser.add_argument('--num_pages', type=int, nargs='+', default=[5, 50, 500]) # Scraped pages per add_documents call
+parser.add_argument('--page_size', type=int, default=20000) # Characters per page
+parser.add_argument('--chunking', type=str, nargs='+', default=["characters", "tokens"])
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+def make_pages(num_pages):
+    random.seed(0)
+    with open(args.data) as f:
+        paragraphs = [" ".join(filter(None, (row["statement"], row["context"], row["Reasoning"]))) for row in csv.DictReader(f)]
+    pages = []
+    for _ in range(num_pages):
+        parts = []
+        while sum(len(part) + 2 for part in parts) < args.page_size: parts.append(random.choice(paragraphs))
+        pages.append("\n\n".join(parts))
+    return pages
+
+def best_time(function):
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# Guarded, since worker processes re-import this script where processes are spawned instead of forked
+if __name__ == "__main__":
+    store = main.VectorStore(model_name=args.model, chunking="tokens")
+    options = {
+        "characters": {"max_chunk_size": 1000, "max_chunk_overlap": 100, "fingerprints": True},
+        "tokens": {"tokenizer": store.chunk_tokenizer, "max_chunk_tokens": store.max_chunk_tokens, "max_chunk_overlap_tokens": 25, "fingerprints": True},
+    }
+    print(f"{os.cpu_count()} CPUs")
+    for workers in args.workers: get_process_pool(workers).submit(len, []).result() # Start pools before timing
+
+    print(f"{'chunking':>10} | {'pages':>5} | {'MB':>5} | " + " | ".join(f"{str(w) + ' workers MB/s':>15}" for w in args.workers) + f" | {'speedup':>7}")
+    for chunking in args.chunking:
+        for num_pages in args.num_pages:
+            pages = make_pages(num_pages)
+            megabytes = sum(len(page) for page in pages) / 2**20
+            baseline = best_time(lambda: chunk_documents(pages, **options[chunking])) # Previous behaviour: all chunking in one thread
+            throughputs = [
+                megabytes / best_time(lambda: list(iter_chunked_documents(pages, num_workers=workers, **options[chunking])))
+                for workers in args.workers
+            ]
+            print(
+                f"{chunking:>10} | {num_pages:>5} | {megabytes:>5.1f} | " + " | ".join(f"{throughput:>15.1f}" for throughput in throughputs)
+                + f" | {max(throughputs) * baseline / megabytes:>6.1f}x"
+            )
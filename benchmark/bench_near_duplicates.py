@@ -0,0 +1,67 @@
+"""Calibration of near-duplicate detection: SimHash distances between unrelated chunks of the pilot data vs. edited copies of them."""
+import sys
+import csv
+import random
+import argparse
+from math import comb
+
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+from bm25 import tokenize
+from dedup import simhash
+from utils import chunk_text
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--data', type=str, default='../data/pilot_updated_v3.csv')
+parser.add_argument('--max_chunk_size', type=int, default=1000)
+parser.add_argument('--max_chunk_overlap', type=int, default=100)
+parser.add_argument('--thresholds', type=int, nargs='+', default=[3, 4, 6, 8, 10])
+parser.add_argument('--max_overlap', type=float, default=0.5) # Pairs sharing more of their words (Jaccard) than this are not counted as unrelated
+args = parser.parse_args()
+
+with open(args.data) as f:
+    texts = [row[field] for row in csv.DictReader(f) for field in ("statement", "context", "Reasoning") if len(row[field].split()) >= 8]
+chunks = list(dict.fromkeys(chunk for text in texts for chunk in chunk_text(text, args.max_chunk_size, args.max_chunk_overlap)))
+print(f"{len(chunks)} distinct chunks")
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+# Unrelated pairs: every pair of chunks, except those overlapping in content (repeated contexts, overlapping chunks)
+fingerprints = [simhash(chunk) for chunk in chunks]
+words = [set(tokenize(chunk)) for chunk in chunks]
+unrelated = []
+for i in range(len(chunks)):
+    for j in range(i + 1, len(chunks)):
+        d = distance(fingerprints[i], fingerprints[j])
+        if d <= max(args.thresholds) + 4 and len(words[i] & words[j]) > args.max_overlap * len(words[i] | words[j]): continue
+        unrelated.append(d)
+unrelated = np.array(unrelated)
+
+# Near-duplicates: copies with punctuation/case changes or a few replaced words
+rng = random.Random(0)
+def replace_words(text, num_words):
+    tokens = text.split()
+    for _ in range(num_words): tokens[rng.randrange(len(tokens))] = rng.choice(["blue", "seven", "policy", "reported", "never", "million"])
+    return " ".join(tokens)
+def change_punctuation(text):
+    return "".join(rng.choice(["", ",", ".", "!"]) if char in ",.;:!?\"'" else char for char in text).upper()
+excerpts = [" ".join(chunk.split()[:25]) for chunk in chunks if len(chunk.split()) >= 25] # Search-result-sized snippets
+edits = {
+    "punctuation/case": [(chunk, change_punctuation(chunk)) for chunk in chunks],
+    "1 word of chunk": [(chunk, replace_words(chunk, 1)) for chunk in chunks],
+    "3 words of chunk": [(chunk, replace_words(chunk, 3)) for chunk in chunks],
+    "5% of chunk": [(chunk, replace_words(chunk, max(1, len(chunk.split()) // 20))) for chunk in chunks],
+    "1 word of 25": [(excerpt, replace_words(excerpt, 1)) for excerpt in excerpts],
+}
+
+print(f"{'threshold':>9} | {'unrelated pairs within':>22} | {'expected if random':>18} | " + " | ".join(f"{name:>16}" for name in edits))
+edit_distances = {name: np.array([distance(simhash(a), simhash(b)) for a, b in pairs]) for name, pairs in edits.items()}
+for threshold in args.thresholds:
+    expected = len(unrelated) * sum(comb(64, i) for i in range(threshold + 1)) / 2**64 # Independent 64-bit fingerprints
+    print(
+        f"{threshold:>9} | {int((unrelated <= threshold).sum()):>22} | {expected:>18.4f} | " +
+        " | ".join(f"{np.mean(distances <= threshold):>16.1%}" for distances in edit_distances.values())
+    )
+print(f"Closest unrelated pair: {unrelated.min()} bits, {len(unrelated)} pairs")
@@ -0,0 +1,81 @@
+"""Memory vs. recall of quantized and dimension-reduced VectorStore indexes, with and without exact re-ranking from disk."""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import faiss
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+from ann import build_index, code_size
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--num_vectors', type=int, default=100000)
+parser.add_argument('--num_queries', type=int, default=1000)
+parser.add_argument('--dimension', type=int, default=384) # all-MiniLM-L6-v2
+parser.add_argument('--k', type=int, default=10)
+parser.add_argument('--rerank_factor', type=int, default=4)
+args = parser.parse_args()
+
+# Clustered synthetic unit vectors, closer to real embeddings than uniform noise
+rng = np.random.default_rng(0)
+centers = rng.standard_normal((200, args.dimension), dtype=np.float32)
+def sample(n):
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, args.dimension), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+vectors, queries = sample(args.num_vectors), sample(args.num_queries)
+ids = np.arange(args.num_vectors)
+
+# Full-precision copy on disk, read back through a memory map for re-ranking like the embedding cache
+full_precision_path = os.path.join(tempfile.mkdtemp(), "vectors.f32")
+vectors.tofile(full_precision_path)
+full_precision = np.memmap(full_precision_path, dtype=np.float32, mode="r", shape=vectors.shape)
+
+def truncate(x, dimension):
+    x = np.ascontiguousarray(x[:, :dimension])
+    faiss.normalize_L2(x)
+    return x
+
+def rerank(indices):
+    reranked = np.empty((len(indices), args.k), dtype=np.int64)
+    for i, candidates in enumerate(indices):
+        candidates = candidates[candidates >= 0]
+        exact_scores = full_precision[candidates] @ queries[i]
+        reranked[i] = candidates[np.argsort(-exact_scores, kind="stable")[:args.k]]
+    return reranked
+
+def recall(indices):
+    return np.mean([len(set(found) & set(expected)) / args.k for found, expected in zip(indices, ground_truth)])
+
+ground_truth = build_index("flat", vectors, ids).search(queries, args.k)[1]
+
+print(f"{'storage':>22} | {'bytes/vector':>12} | {'reduction':>9} | {'recall@' + str(args.k):>9} | {'reranked':>9} | {'ms/query':>8} | {'reranked ms/query':>17}")
+for name, kwargs, truncated_dimension in [
+    ("float32", {}, None),
+    ("sq8", {"quantization": "sq8"}, None),
+    ("pq", {"quantization": "pq"}, None),
+    ("pca128 + float32", {"pca_dimension": 128}, None),
+    ("pca128 + sq8", {"quantization": "sq8", "pca_dimension": 128}, None),
+    ("pca64 + pq", {"quantization": "pq", "pca_dimension": 64}, None),
+    ("truncate128 + sq8", {"quantization": "sq8"}, 128),
+]:
+    index_vectors = truncate(vectors, truncated_dimension) if truncated_dimension else vectors
+    index_queries = truncate(queries, truncated_dimension) if truncated_dimension else queries
+    index = build_index("flat", index_vectors, ids, **kwargs)
+
+    start = time.perf_counter()
+    indices = index.search(index_queries, args.k)[1]
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+
+    start = time.perf_counter()
+    reranked = rerank(index.search(index_queries, args.k * args.rerank_factor)[1])
+    rerank_latency = (time.perf_counter() - start) / len(queries) * 1000
+
+    bytes_per_vector = code_size(index)
+    print(
+        f"{name:>22} | {bytes_per_vector:>12} | {args.dimension * 4 / bytes_per_vector:>8.1f}x | {recall(indices):>9.3f} | "
+        f"{recall(reranked):>9.3f} | {latency:>8.3f} | {rerank_latency:>17.3f}"
+    )
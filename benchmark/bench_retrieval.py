@@ -0,0 +1,61 @@
+"""Micro-benchmark of hybrid retrieval latency (VectorStore.retrieve) against corpus size."""
+import sys
+import time
+import random
+import argparse
+
+import faiss
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+import main_v2 as main
+from ann import build_index
+from dedup import content_hash
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000, 50000])
+parser.add_argument('--num_queries', type=int, default=50)
+parser.add_argument('--k', type=int, default=10)
+args = parser.parse_args()
+
+random.seed(0)
+rng = np.random.default_rng(0)
+VOCAB = [f"word{i}" for i in range(5000)] + "the economy jobs record million growth rate inflation wages border".split()
+
+def legacy_retrieve(store, query, k):
+    """Previous hybrid scoring: BM25 re-scored over the whole corpus for every FAISS hit."""
+    query_embedding = store.encoder.encode([query])
+    faiss_scores, faiss_indices = store.index.search(query_embedding, k)
+    results = []
+    for i, idx in enumerate(faiss_indices[0]):
+        bm25_score = store.bm25.get_scores(query)[idx]
+        results.append((idx, store.bm25_weight * bm25_score + (1 - store.bm25_weight) * float(faiss_scores[0][i])))
+    return sorted(results, key=lambda x: x[1], reverse=True)
+
+store = main.VectorStore(model_name=main.EMBEDDING_MODEL, use_bm25=True, bm25_weight=main.BM25_WEIGHT)
+dimension = store.encoder.get_sentence_embedding_dimension()
+queries = [" ".join(random.choices(VOCAB, k=6)) for _ in range(args.num_queries)]
+
+print(f"{'corpus size':>12} | {'legacy (ms/query)':>18} | " + " | ".join(f"{mode + ' (ms/query)':>18}" for mode in ["weighted", "minmax", "rrf"]))
+for size in args.sizes:
+    # Fill the store with a synthetic corpus and random unit embeddings (encoding is not what is measured here)
+    store.clear()
+    documents = [" ".join(random.choices(VOCAB, k=random.randint(20, 60))) for _ in range(size)]
+    embeddings = rng.standard_normal((size, dimension), dtype=np.float32)
+    faiss.normalize_L2(embeddings)
+    store.index = build_index("flat", embeddings, np.arange(size))
+    store.chunks.extend(documents, [{"title": "", "url": "", "source": ""}] * size, [content_hash(document) for document in documents], added_at=time.time())
+    store.bm25.add_documents(documents)
+
+    timings = []
+    start = time.perf_counter()
+    for query in queries: legacy_retrieve(store, query, args.k)
+    timings.append((time.perf_counter() - start) / len(queries) * 1000)
+
+    for mode in ["weighted", "minmax", "rrf"]:
+        store.fusion = mode
+        start = time.perf_counter()
+        for query in queries: store.retrieve(query, k=args.k)
+        timings.append((time.perf_counter() - start) / len(queries) * 1000)
+
+    print(f"{size:>12} | " + " | ".join(f"{t:>18.2f}" for t in timings))
@@ -0,0 +1,62 @@
+"""Character vs. token chunking: how much chunk text the embedding model truncates, tokens encoded, and chunking time."""
+import sys
+import csv
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+import main_v2 as main
+from encoders import get_encoder
+from utils import chunk_text, token_chunk_spans
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--model', type=str, default=main.EMBEDDING_MODEL)
+parser.add_argument('--data', type=str, default='../data/pilot_updated_v3.csv')
+parser.add_argument('--num_pages', type=int, default=100)
+parser.add_argument('--page_size', type=int, default=20000) # Characters per page
+parser.add_argument('--max_chunk_size', type=int, default=1000)
+parser.add_argument('--max_chunk_overlap', type=int, default=100)
+parser.add_argument('--max_chunk_overlap_tokens', type=int, default=25)
+args = parser.parse_args()
+
+# Pages built from the pilot set's statements and fact-check reasoning
+random.seed(0)
+with open(args.data) as f:
+    paragraphs = [" ".join(filter(None, (row["statement"], row["context"], row["Reasoning"]))) for row in csv.DictReader(f)]
+def make_page():
+    parts = []
+    while sum(len(part) + 2 for part in parts) < args.page_size: parts.append(random.choice(paragraphs))
+    return "\n\n".join(parts)
+pages = [make_page() for _ in range(args.num_pages)]
+
+store = main.VectorStore(model_name=args.model, chunking="tokens", max_chunk_overlap_tokens=args.max_chunk_overlap_tokens)
+tokenizer = store.chunk_tokenizer
+max_tokens = store.max_chunk_tokens
+print(f"{args.model}: max sequence length {get_encoder(args.model).max_seq_length}, {max_tokens} tokens per chunk without special tokens")
+
+def token_lengths(chunks):
+    return np.array([len(ids) for ids in tokenizer(chunks, add_special_tokens=False)["input_ids"]])
+
+start = time.perf_counter()
+char_chunks = [chunk for page in pages for chunk in chunk_text(page, args.max_chunk_size, args.max_chunk_overlap)]
+char_time = time.perf_counter() - start
+
+start = time.perf_counter()
+token_spans = token_chunk_spans(pages, tokenizer, max_tokens, args.max_chunk_overlap_tokens)
+token_time = time.perf_counter() - start
+token_chunks = [page[start:end] for page, spans in zip(pages, token_spans) for start, end, _ in spans]
+counted = np.array([num_tokens for spans in token_spans for _, _, num_tokens in spans])
+
+print(f"{'chunking':>10} | {'chunks':>7} | {'mean tokens':>11} | {'truncated chunks':>16} | {'tokens dropped':>14} | {'tokens encoded':>14} | {'chunking ms':>11}")
+for name, chunks, elapsed in [("characters", char_chunks, char_time), ("tokens", token_chunks, token_time)]:
+    lengths = token_lengths(chunks)
+    dropped = np.maximum(lengths - max_tokens, 0)
+    encoded = np.minimum(lengths, max_tokens)
+    print(
+        f"{name:>10} | {len(chunks):>7} | {lengths.mean():>11.1f} | {np.mean(dropped > 0):>16.1%} | "
+        f"{dropped.sum() / lengths.sum():>14.1%} | {encoded.sum():>14} | {elapsed * 1000:>11.1f}"
+    )
+print(f"Cached token counts match re-tokenized chunks: {np.mean(counted == token_lengths(token_chunks)):.1%}")
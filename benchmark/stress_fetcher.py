@@ -0,0 +1,51 @@
+"""Stress test of PageFetcher against a local server with slow pages, checking that pages queued behind the per-host limit do not time out."""
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+from aiohttp import web
+
+sys.path.append('../pipeline_v2/')
+from fetcher import PageFetcher
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--num_pages', type=int, default=8) # Pages fetched from the one local host
+parser.add_argument('--page_seconds', type=float, default=1.0) # Server delay per page
+parser.add_argument('--max_per_host', type=int, default=2)
+parser.add_argument('--timeout', type=float, default=2.5) # Longer than one page, shorter than the whole queue of pages
+parser.add_argument('--port', type=int, default=8765)
+args = parser.parse_args()
+
+async def slow_page(request):
+    await asyncio.sleep(args.page_seconds)
+    return web.Response(text=f"<html><body><p>Page {request.match_info['n']} has enough words in it to be kept as content.</p></body></html>", content_type="text/html")
+
+def serve(started):
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.add_routes([web.get('/page/{n}', slow_page)])
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', args.port).start())
+    started.set()
+    loop.run_forever()
+
+started = threading.Event()
+threading.Thread(target=serve, args=(started,), daemon=True).start()
+started.wait()
+
+fetcher = PageFetcher(timeout=args.timeout, max_per_host=args.max_per_host)
+urls = [f"http://127.0.0.1:{args.port}/page/{i}" for i in range(args.num_pages)]
+start = time.perf_counter()
+pages = dict(fetcher.fetch_many(urls))
+elapsed = time.perf_counter() - start
+fetcher.close()
+
+errors = [f"Missing {url}" for url in urls if url not in pages]
+expected_seconds = -(-args.num_pages // args.max_per_host) * args.page_seconds # Waves of max_per_host pages
+print(f"{len(pages)} of {args.num_pages} pages in {elapsed:.2f}s (expected ~{expected_seconds:.2f}s), {fetcher.stats()}")
+print(f"Errors: {len(errors)}")
+for error in errors[:20]: print(f"  {error}")
+sys.exit(1 if errors else 0)
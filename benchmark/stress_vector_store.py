@@ -0,0 +1,112 @@
+"""Stress test of concurrent VectorStore adds, retrievals and evictions, checking every read for torn or leaked results."""
+import sys
+import time
+import random
+import hashlib
+import argparse
+import threading
+
+import numpy as np
+
+sys.path.append('../pipeline_v2/')
+import main_v2 as main
+from dedup import content_hash
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--num_writers', type=int, default=4)
+parser.add_argument('--num_readers', type=int, default=8)
+parser.add_argument('--batches_per_writer', type=int, default=50)
+parser.add_argument('--batch_size', type=int, default=20)
+parser.add_argument('--k', type=int, default=10)
+parser.add_argument('--max_chunks', type=int, default=None) # Also exercise eviction under load
+parser.add_argument('--use_bm25', action='store_true')
+args = parser.parse_args()
+
+class HashEncoder:
+    """Deterministic pseudo-embeddings, so the test exercises the store rather than the model."""
+    def __init__(self, dimension):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, sentences, **kwargs):
+        embeddings = np.stack([
+            np.random.default_rng(int.from_bytes(hashlib.md5(sentence.encode()).digest()[:8], "little")).standard_normal(self.dimension)
+            for sentence in sentences
+        ]).astype(np.float32)
+        return HashEncoder.Tensor(embeddings) if kwargs.get("convert_to_tensor") else embeddings
+
+    class Tensor:
+        def __init__(self, array): self.array = array
+        def cpu(self): return self
+        def numpy(self): return self.array
+
+store = main.VectorStore(model_name=main.EMBEDDING_MODEL, use_bm25=args.use_bm25, fusion="rrf", max_chunks=args.max_chunks)
+store.encoder = HashEncoder(store.encoder.get_sentence_embedding_dimension())
+main.print = lambda *a, **k: None # Silence "No non-duplicate chunks" messages
+
+errors, errors_lock = [], threading.Lock()
+def record_error(message):
+    with errors_lock: errors.append(message)
+
+# Shared context visible from every namespace
+store.add_documents([f"global context document {i}" for i in range(10)], [{"namespace": main.GLOBAL_NAMESPACE}] * 10)
+
+def writer(writer_id):
+    namespace = f"statement-{writer_id}"
+    rng = random.Random(writer_id)
+    for batch in range(args.batches_per_writer):
+        documents = [f"{namespace} batch {batch} evidence {i} {rng.random()}" for i in range(args.batch_size)]
+        store.add_documents(documents, [{"namespace": namespace, "hash": content_hash(document)} for document in documents], namespace=namespace)
+        counts[0] += 1
+
+def reader(reader_id, stop):
+    rng = random.Random(1000 + reader_id)
+    while not stop.is_set():
+        namespace = f"statement-{rng.randrange(args.num_writers)}"
+        for documents in store.retrieve_many([f"{namespace} evidence", "global context"], k=args.k, namespace=namespace):
+            for document in documents:
+                if document.content is None or document.metadata is None:
+                    record_error(f"Evicted chunk {document.chunk_id} returned")
+                elif document.metadata["namespace"] not in (namespace, main.GLOBAL_NAMESPACE):
+                    record_error(f"Chunk of {document.metadata['namespace']} leaked into {namespace}")
+                elif "hash" in document.metadata and content_hash(document.content) != document.metadata["hash"]:
+                    record_error(f"Torn read: text and metadata of chunk {document.chunk_id} do not match")
+
+        # Index, texts and hash map must agree whenever no writer holds the lock
+        with store._lock.read():
+            num_resident = len(store.chunks.resident_ids())
+            if not store.index.ntotal == len(store.chunk_ids) == num_resident:
+                record_error(f"Inconsistent snapshot: {store.index.ntotal} vectors, {len(store.chunk_ids)} hashes, {num_resident} texts")
+        counts[1] += 1
+
+def record_exceptions(function):
+    """Count exceptions raised inside worker threads as errors instead of only printing them."""
+    def wrapper(*args):
+        try:
+            function(*args)
+        except Exception as e:
+            record_error(f"{function.__name__} raised {type(e).__name__}: {e}")
+    return wrapper
+
+counts = [0, 0] # Batches added, retrieval rounds (approximate under races, only used for throughput)
+stop = threading.Event()
+readers = [threading.Thread(target=record_exceptions(reader), args=(i, stop)) for i in range(args.num_readers)]
+writers = [threading.Thread(target=record_exceptions(writer), args=(i,)) for i in range(args.num_writers)]
+start = time.perf_counter()
+for thread in readers + writers: thread.start()
+for thread in writers: thread.join()
+stop.set()
+for thread in readers: thread.join()
+elapsed = time.perf_counter() - start
+
+expected_chunks = 10 + args.num_writers * args.batches_per_writer * args.batch_size
+print(f"{args.num_writers} writers, {args.num_readers} readers, {elapsed:.2f}s")
+print(f"Adds: {counts[0]} batches ({counts[0] / elapsed:.1f}/s), retrieval rounds: {counts[1]} ({counts[1] / elapsed:.1f}/s)")
+print(f"Store: {store.stats()} (expected {expected_chunks} chunks added)")
+if args.max_chunks is None and store.stats()["resident_chunks"] != expected_chunks:
+    record_error(f"Lost adds: {store.stats()['resident_chunks']} of {expected_chunks} chunks stored")
+print(f"Errors: {len(errors)}")
+for error in errors[:20]: print(f"  {error}")
+sys.exit(1 if errors else 0)
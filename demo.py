@@ -24,6 +24,7 @@ from main import (
     SearchProvider, VectorStore, ClaimExtractor, QuestionGenerator,
     AnswerSynthesizer, ClaimEvaluator, OverallStatementEvaluator
 )
+from encoders import encoder_stats
 
 class StreamlitFactCheckPipeline:
     def __init__(
@@ -348,6 +349,10 @@ def main():
                     web_search=use_web_search
                 )
 
+                # Encoders are loaded once per process and shared by every run
+                for encoder_name, stats in encoder_stats().items():
+                    st.sidebar.caption(f"Encoder {encoder_name}: loaded in {stats['load_seconds']:.1f}s ({stats['parameter_bytes'] / 2**20:.0f} MB)")
+
         except Exception as e:
             st.error(f"An error occurred: {str(e)}")
 
@@ -0,0 +1,204 @@
+import math
+from typing import Literal
+
+import faiss
+import numpy as np
+
+IndexType = Literal["flat", "hnsw", "ivf_flat", "ivf_pq"]
+Quantization = Literal["sq8", "pq"]
+
+def index_factory_string(
+    index_type: IndexType, 
+    dimension: int, 
+    num_vectors: int, 
+    hnsw_m: int = 32, 
+    pq_m: int = None, 
+    quantization: Quantization = None, 
+    pca_dimension: int = None
+) -> str:
+    """
+    Build the faiss.index_factory description for an index type
+    *** params ***
+    index_type: "flat" (exact), "hnsw" (graph), "ivf_flat" (inverted lists) or "ivf_pq" (inverted lists + product quantization)
+    dimension: embedding dimension
+    num_vectors: number of vectors the index is trained on (sets the number of IVF lists)
+    hnsw_m: number of neighbors per HNSW node
+    pq_m: number of PQ sub-quantizers (defaults to dimension / 8)
+    quantization: store vectors as int8 scalar-quantized ("sq8", 4x smaller) or product-quantized ("pq", pq_m bytes) codes
+        instead of float32 (None); ivf_pq always uses product quantization
+    pca_dimension: project vectors to this many dimensions with PCA (re-normalized afterwards) before indexing (None to keep all)
+
+    *** returns ***
+    Index factory string
+    """
+    # ~4 * sqrt(n) lists, keeping at least ~39 training points per list as FAISS recommends
+    num_lists = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+    prefix = f"PCA{pca_dimension},L2norm," if pca_dimension else ""
+    dimension = pca_dimension or dimension
+    pq_m = pq_m or max(d for d in range(1, dimension // 8 + 1) if dimension % d == 0)
+    codes = {None: "Flat", "sq8": "SQ8", "pq": f"PQ{pq_m}"}[quantization]
+    if index_type == "flat":
+        # IndexPQ does not support id selectors (namespaces), a single inverted list scans all codes the same way
+        return prefix + (f"IVF1,{codes}" if quantization == "pq" else codes)
+    elif index_type == "hnsw":
+        return prefix + f"HNSW{hnsw_m},{codes}"
+    elif index_type == "ivf_flat":
+        return prefix + f"IVF{num_lists},{codes}"
+    elif index_type == "ivf_pq":
+        return prefix + f"IVF{num_lists},PQ{pq_m}"
+    else:
+        raise ValueError(f"Unsupported index type: {index_type}")
+
+def build_index(index_type: IndexType, vectors: np.ndarray, ids: np.ndarray = None, **kwargs) -> faiss.Index:
+    """
+    Create an inner-product index of the given type, train it on `vectors` if needed, and add them
+    (under the given ids if `ids` is passed: IVF indexes store ids themselves, others get an IndexIDMap2 wrapper).
+    """
+    index = faiss.index_factory(
+        vectors.shape[1],
+        index_factory_string(index_type, vectors.shape[1], len(vectors), **kwargs),
+        faiss.METRIC_INNER_PRODUCT
+    )
+    if not index.is_trained: index.train(vectors)
+    if ids is None:
+        index.add(vectors)
+        return index
+    if faiss.try_extract_index_ivf(search_index(index)) is not None:
+        # IVF removal does not renumber the remaining vectors, which an IndexIDMap2 wrapper relies on
+        index.add_with_ids(vectors, ids)
+        return index
+    id_index = faiss.IndexIDMap2(index)
+    index.this.disown() # The wrapper owns (and frees) the inner index
+    id_index.own_fields = True
+    id_index.add_with_ids(vectors, ids)
+    return id_index
+
+def unwrap_index(index: faiss.Index) -> faiss.Index:
+    """Return the index wrapped by an IndexIDMap/IndexIDMap2 (or the index itself)."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+def stored_vectors(index: faiss.Index) -> tuple:
+    """Return (vectors, ids) of all vectors in a flat index (wrapped in an IndexIDMap2, or saved as a single-list IVF by mappable_index)."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFFlat):
+        if index.ntotal == 0: return np.zeros((0, index.d), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        codes = faiss.rev_swig_ptr(index.invlists.get_codes(0), index.ntotal * index.code_size)
+        ids = faiss.rev_swig_ptr(index.invlists.get_ids(0), index.ntotal)
+        return np.frombuffer(codes, dtype=np.float32).reshape(-1, index.d).copy(), np.array(ids, dtype=np.int64)
+    return unwrap_index(index).reconstruct_n(0, index.ntotal), faiss.vector_to_array(index.id_map)
+
+def mappable_index(index: faiss.Index) -> faiss.Index:
+    """
+    Return an equivalent index that faiss.read_index(..., IO_FLAG_MMAP) memory-maps, since FAISS only maps IVF inverted lists:
+    flat and scalar-quantized indexes wrapped in an IndexIDMap2 are copied into a single-list IVF over the same codes,
+    which holds the ids itself and still scans every vector. Other indexes are returned as is.
+    """
+    index = faiss.downcast_index(index)
+    if not isinstance(index, faiss.IndexIDMap2): return index
+    inner = faiss.downcast_index(index.index)
+    transform = inner if isinstance(inner, faiss.IndexPreTransform) else None
+    if transform is not None: inner = faiss.downcast_index(transform.index)
+
+    quantizer = faiss.IndexFlat(inner.d, inner.metric_type) # Single centroid, every vector goes to list 0
+    quantizer.add(np.zeros((1, inner.d), dtype=np.float32))
+    if isinstance(inner, faiss.IndexFlat):
+        ivf = faiss.IndexIVFFlat(quantizer, inner.d, 1, inner.metric_type)
+    elif isinstance(inner, faiss.IndexScalarQuantizer):
+        ivf = faiss.IndexIVFScalarQuantizer(quantizer, inner.d, 1, inner.sq.qtype, inner.metric_type, False) # Same codes without residuals
+        ivf.sq = inner.sq
+    else:
+        return index
+    ivf.is_trained = True
+    if inner.ntotal > 0:
+        codes = faiss.rev_swig_ptr(inner.codes.data(), inner.ntotal * inner.code_size) # View, not a copy
+        ids = faiss.vector_to_array(index.id_map)
+        ivf.invlists.add_entries(0, inner.ntotal, faiss.swig_ptr(ids), faiss.swig_ptr(codes))
+        ivf.ntotal = inner.ntotal
+    if transform is None: return ivf
+
+    mappable = faiss.IndexPreTransform(ivf)
+    for i in reversed(range(transform.chain.size())): mappable.prepend_transform(transform.chain.at(i))
+    mappable.own_fields = False # The transforms belong to `index`
+    mappable.referenced_objects = [ivf, index]
+    return mappable
+
+def remap_ids(index: faiss.Index, new_ids: np.ndarray):
+    """Renumber the ids stored in an index in place (new_ids[old id] = new id), e.g. after the store compacted its chunk ids."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        faiss.copy_array_to_vector(new_ids[faiss.vector_to_array(index.id_map)].astype(np.int64), index.id_map)
+        if isinstance(index, faiss.IndexIDMap2): index.construct_rev_map()
+        return
+    ivf = faiss.try_extract_index_ivf(search_index(index))
+    if ivf is None: raise ValueError(f"Cannot renumber the ids of a {type(index).__name__} index")
+    for list_no in range(ivf.nlist):
+        size = ivf.invlists.list_size(list_no)
+        if size == 0: continue
+        ids = faiss.rev_swig_ptr(ivf.invlists.get_ids(list_no), size) # View of the list's ids
+        ids[:] = new_ids[ids]
+
+def load_inverted_lists(index: faiss.Index):
+    """Copy inverted lists memory-mapped (read-only) by faiss.read_index(..., IO_FLAG_MMAP) into memory, so vectors can be added and removed."""
+    ivf = faiss.try_extract_index_ivf(search_index(index))
+    if ivf is None: return
+    invlists = faiss.downcast_InvertedLists(ivf.invlists)
+    if not isinstance(invlists, faiss.OnDiskInvertedLists): return
+    copy = faiss.ArrayInvertedLists(ivf.nlist, ivf.code_size)
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if size > 0: copy.add_entries(list_no, size, invlists.get_ids(list_no), invlists.get_codes(list_no))
+    ivf.replace_invlists(copy, True)
+    copy.this.disown() # Owned by the index
+
+def set_search_parameters(index: faiss.Index, nprobe: int = None, ef_search: int = None):
+    """Set query-time accuracy/speed knobs on the index (ignored by index types they do not apply to)."""
+    parameters = faiss.ParameterSpace()
+    inner_index = search_index(index)
+    if nprobe is not None and faiss.try_extract_index_ivf(inner_index) is not None:
+        parameters.set_index_parameter(index, "nprobe", nprobe)
+    if ef_search is not None and isinstance(inner_index, faiss.IndexHNSW):
+        inner_index.hnsw.efSearch = ef_search
+
+def filtered_search_parameters(index: faiss.Index, ids: np.ndarray, nprobe: int = None, ef_search: int = None) -> faiss.SearchParameters:
+    """
+    Build per-query search parameters restricting a search to the given ids
+    *** params ***
+    index: index to search (ids are the ones added with add_with_ids if it is an IndexIDMap2)
+    ids: ids allowed in the results
+    nprobe, ef_search: query-time knobs of the index, since index-specific parameters override the index's own settings
+
+    *** returns ***
+    faiss.SearchParameters to pass to index.search(..., params=...)
+    """
+    selector = faiss.IDSelectorBatch(np.ascontiguousarray(ids, dtype=np.int64))
+    inner_index = search_index(index)
+    if faiss.try_extract_index_ivf(inner_index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe or faiss.extract_index_ivf(inner_index).nprobe)
+    elif isinstance(inner_index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search or inner_index.hnsw.efSearch)
+    elif isinstance(inner_index, faiss.IndexPQ):
+        return faiss.SearchParametersPQ(sel=selector)
+    return faiss.SearchParameters(sel=selector)
+
+def search_index(index: faiss.Index) -> faiss.Index:
+    """Return the index doing the search, below any IndexIDMap2 and IndexPreTransform (PCA) wrappers."""
+    index = unwrap_index(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index)
+    return index
+
+def code_size(index: faiss.Index) -> int:
+    """Bytes stored per vector by the index (excluding graph/inverted list overhead)."""
+    index = search_index(index)
+    if isinstance(index, faiss.IndexHNSW): index = faiss.downcast_index(index.storage)
+    try:
+        return index.sa_code_size()
+    except RuntimeError: # Not implemented by every index type
+        return index.d * np.dtype(np.float32).itemsize
+
+def is_flat(index: faiss.Index) -> bool:
+    index = unwrap_index(index)
+    return isinstance(index, faiss.IndexFlat) or (isinstance(index, faiss.IndexIVFFlat) and index.nlist == 1)
@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import xxhash
+
+from storage import save_npy
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer used for both documents and queries."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def term_hash(term: str) -> int:
+    """64-bit hash a term is indexed under (xxh3), so saved postings need no vocabulary of strings."""
+    return xxhash.xxh3_64_intdigest(term.encode("utf-8"))
+
+class BM25Index:
+    """
+    Incremental Okapi BM25 index over an inverted index of postings, keyed by term hash.
+    New documents append their postings and update document frequencies in place (no rebuild),
+    and queries only touch the postings of their own terms.
+    Postings loaded from disk stay memory-mapped as CSR columns (sorted term hashes, offsets, doc ids, term frequencies);
+    documents added afterwards get in-memory postings, and removed documents are masked out of the mapped postings until `compact`.
+    Scoring matches rank_bm25.BM25Okapi (including its epsilon floor for negative IDF values).
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.postings: Dict[int, Tuple[array, array]] = {} # In-memory postings: term hash -> (doc ids, term frequencies)
+        self.doc_lengths = array('i') # By doc id (0 for removed documents)
+        self.total_length = 0
+        self.num_removed = 0
+
+        # Memory-mapped segment (empty unless loaded from disk), holding the postings of doc ids below _num_mapped_docs
+        self._terms = np.zeros(0, dtype=np.uint64) # Sorted
+        self._offsets = np.zeros(1, dtype=np.int64) # Postings of _terms[i] are _doc_ids/_frequencies[_offsets[i]:_offsets[i + 1]]
+        self._doc_ids = np.zeros(0, dtype=np.int32)
+        self._frequencies = np.zeros(0, dtype=np.int32)
+        self._num_mapped_docs = 0
+        self._removed_postings: Dict[int, int] = {} # Term hash -> removed mapped documents containing it
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths) - self.num_removed
+
+    def _mapped_span(self, term: int) -> Tuple[int, int]:
+        """(start, end) of a term's postings in the mapped segment (empty if it has none)."""
+        if len(self._terms) == 0: return 0, 0
+        key = np.uint64(term)
+        position = int(np.searchsorted(self._terms, key))
+        if position == len(self._terms) or self._terms[position] != key: return 0, 0
+        return int(self._offsets[position]), int(self._offsets[position + 1])
+
+    def _document_frequency(self, term: int) -> int:
+        start, end = self._mapped_span(term)
+        postings = self.postings.get(term)
+        return end - start - self._removed_postings.get(term, 0) + (len(postings[0]) if postings is not None else 0)
+
+    def add_documents(self, documents: List[str]):
+        """Tokenize new documents and append their postings to the index."""
+        for text in documents:
+            doc_id = len(self.doc_lengths)
+            tokens = tokenize(text)
+            for term, frequency in Counter(tokens).items():
+                doc_ids, frequencies = self.postings.setdefault(term_hash(term), (array('i'), array('i')))
+                doc_ids.append(doc_id)
+                frequencies.append(frequency)
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+
+    def remove_document(self, doc_id: int, text: str):
+        """Remove a document's postings (given its original text) and update the corpus statistics in place."""
+        tokens = tokenize(text)
+        for term in set(map(term_hash, tokens)):
+            if doc_id < self._num_mapped_docs: # Read-only, masked out by its zero length
+                self._removed_postings[term] = self._removed_postings.get(term, 0) + 1
+                continue
+            doc_ids, frequencies = self.postings[term]
+            position = bisect_left(doc_ids, doc_id) # Postings are sorted by doc id
+            del doc_ids[position], frequencies[position]
+            if len(doc_ids) == 0: del self.postings[term]
+        self.doc_lengths[doc_id] = 0
+        self.total_length -= len(tokens)
+        self.num_removed += 1
+
+    def _load_postings(self):
+        """Copy the mapped postings of documents not removed in front of the in-memory postings (mapped doc ids come first)."""
+        if len(self._terms) == 0: return
+        alive = np.frombuffer(self.doc_lengths, dtype=np.int32)[self._doc_ids] > 0
+        for i, term in enumerate(self._terms.tolist()):
+            start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+            keep = alive[start:end]
+            if not keep.any(): continue
+            doc_ids, frequencies = array('i', self._doc_ids[start:end][keep].tobytes()), array('i', self._frequencies[start:end][keep].tobytes())
+            postings = self.postings.get(term)
+            if postings is not None: doc_ids, frequencies = doc_ids + postings[0], frequencies + postings[1]
+            self.postings[term] = (doc_ids, frequencies)
+        self._terms, self._offsets = np.zeros(0, dtype=np.uint64), np.zeros(1, dtype=np.int64)
+        self._doc_ids, self._frequencies = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        self._num_mapped_docs = 0
+        self._removed_postings = {}
+
+    def compact(self, kept: np.ndarray):
+        """Drop removed documents' ids, renumbering the rest: `kept` holds the old id of each remaining document in order (its new id is its position)."""
+        self._load_postings()
+        new_ids = np.full(len(self.doc_lengths), -1, dtype=np.int32)
+        new_ids[kept] = np.arange(len(kept), dtype=np.int32)
+        for doc_ids, _ in self.postings.values():
+            view = np.frombuffer(doc_ids, dtype=np.int32) # In place, postings stay sorted since the order is kept
+            view[:] = new_ids[view]
+            del view # Release the buffer so the array can grow again
+        self.doc_lengths = array('i', np.frombuffer(self.doc_lengths, dtype=np.int32)[kept].tobytes())
+        self.num_removed = 0
+
+    def _vocabulary_frequencies(self) -> np.ndarray:
+        """Document frequency of every term with at least one document."""
+        frequencies = np.diff(self._offsets)
+        if self._removed_postings:
+            removed = np.fromiter(self._removed_postings.keys(), dtype=np.uint64, count=len(self._removed_postings))
+            np.subtract.at(frequencies, np.searchsorted(self._terms, removed), np.fromiter(self._removed_postings.values(), dtype=np.int64))
+        terms = np.fromiter(self.postings.keys(), dtype=np.uint64, count=len(self.postings))
+        term_frequencies = np.array([len(doc_ids) for doc_ids, _ in self.postings.values()], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._terms, terms), max(len(self._terms) - 1, 0))
+        mapped = self._terms[positions] == terms if len(self._terms) > 0 else np.zeros(len(terms), dtype=bool)
+        np.add.at(frequencies, positions[mapped], term_frequencies[mapped])
+        frequencies = np.concatenate([frequencies, term_frequencies[~mapped]])
+        return frequencies[frequencies > 0]
+
+    def _idf(self, terms: List[int]) -> Dict[int, float]:
+        """IDF of the given terms, with negative values floored to epsilon * average IDF over the vocabulary."""
+        num_docs = len(self)
+        idf = {}
+        for term in terms:
+            document_frequency = self._document_frequency(term)
+            idf[term] = math.log(num_docs - document_frequency + 0.5) - math.log(document_frequency + 0.5)
+        if any(value < 0 for value in idf.values()):
+            # Average IDF over the whole vocabulary is only needed when some query term is very common
+            document_frequencies = self._vocabulary_frequencies().astype(np.float64)
+            average_idf = float(np.mean(np.log(num_docs - document_frequencies + 0.5) - np.log(document_frequencies + 0.5)))
+            idf = {term: value if value >= 0 else self.epsilon * average_idf for term, value in idf.items()}
+        return idf
+
+    def get_scores(self, query: str) -> np.ndarray:
+        """Return BM25 scores of every document for the query."""
+        return self.get_batch_scores([query])[0]
+
+    def get_batch_scores(self, queries: List[str]) -> np.ndarray:
+        """Return a (num queries, num documents) matrix of BM25 scores, each term's postings are read once per batch."""
+        scores = np.zeros((len(queries), len(self.doc_lengths)), dtype=np.float32)
+        document_frequencies = {}
+        for query in queries:
+            for term in map(term_hash, tokenize(query)):
+                if term not in document_frequencies: document_frequencies[term] = self._document_frequency(term)
+        query_terms = [Counter(term for term in map(term_hash, tokenize(query)) if document_frequencies[term] > 0) for query in queries]
+        batch_terms = list(set().union(*query_terms))
+        if len(batch_terms) == 0: return scores
+
+        # Zero-copy views over the postings arrays, only the query terms' postings are touched
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.int32)
+        average_length = self.total_length / len(self)
+        for term, idf in self._idf(batch_terms).items():
+            start, end = self._mapped_span(term)
+            doc_ids, frequencies = self._doc_ids[start:end], self._frequencies[start:end]
+            postings = self.postings.get(term)
+            if postings is not None:
+                doc_ids = np.concatenate([doc_ids, np.frombuffer(postings[0], dtype=np.int32)]) if end > start else np.frombuffer(postings[0], dtype=np.int32)
+                frequencies = np.concatenate([frequencies, np.frombuffer(postings[1], dtype=np.int32)]) if end > start else np.frombuffer(postings[1], dtype=np.int32)
+            frequencies = frequencies.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[doc_ids] / average_length)
+            term_scores = idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+            for i, terms in enumerate(query_terms):
+                if term in terms: scores[i, doc_ids] += terms[term] * term_scores
+        if self._removed_postings: # Removed documents still in the mapped postings
+            scores[:, np.flatnonzero(doc_lengths[:self._num_mapped_docs] == 0)] = 0
+        return scores
+
+    def clear(self):
+        self.postings = {}
+        self.doc_lengths = array('i')
+        self.total_length = 0
+        self.num_removed = 0
+        self._terms, self._offsets = np.zeros(0, dtype=np.uint64), np.zeros(1, dtype=np.int64)
+        self._doc_ids, self._frequencies = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        self._num_mapped_docs = 0
+        self._removed_postings = {}
+
+    def save(self, path: str):
+        """Write the postings of documents not removed as CSR columns (bm25_*.npy) and the corpus statistics (bm25.json) to a directory."""
+        # Postings of both segments as (term, doc id, frequency) triples, sorted by term then doc id
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.int32)
+        alive = doc_lengths[self._doc_ids] > 0
+        tail_terms = np.fromiter(self.postings.keys(), dtype=np.uint64, count=len(self.postings))
+        tail_counts = [len(doc_ids) for doc_ids, _ in self.postings.values()]
+        terms = np.concatenate([np.repeat(self._terms, np.diff(self._offsets))[alive], np.repeat(tail_terms, tail_counts)])
+        doc_ids = np.concatenate([self._doc_ids[alive]] + [np.frombuffer(doc_ids, dtype=np.int32) for doc_ids, _ in self.postings.values()])
+        frequencies = np.concatenate([self._frequencies[alive]] + [np.frombuffer(frequencies, dtype=np.int32) for _, frequencies in self.postings.values()])
+        order = np.lexsort((doc_ids, terms))
+        terms, doc_ids, frequencies = terms[order], doc_ids[order], frequencies[order]
+        unique_terms, starts = np.unique(terms, return_index=True)
+
+        save_npy(os.path.join(path, "bm25_terms.npy"), unique_terms)
+        save_npy(os.path.join(path, "bm25_offsets.npy"), np.append(starts, len(terms)).astype(np.int64))
+        save_npy(os.path.join(path, "bm25_doc_ids.npy"), doc_ids.astype(np.int32))
+        save_npy(os.path.join(path, "bm25_frequencies.npy"), frequencies.astype(np.int32))
+        save_npy(os.path.join(path, "bm25_doc_lengths.npy"), doc_lengths)
+        with open(os.path.join(path, "bm25.json.tmp"), "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "epsilon": self.epsilon, "total_length": self.total_length, "num_removed": self.num_removed}, f)
+        os.replace(os.path.join(path, "bm25.json.tmp"), os.path.join(path, "bm25.json"))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> Optional["BM25Index"]:
+        """Load an index written by `save`, memory-mapping the postings if `mmap`, or None if the directory has none."""
+        if not os.path.exists(os.path.join(path, "bm25.json")): return None
+        with open(os.path.join(path, "bm25.json")) as f:
+            stats = json.load(f)
+        index = cls(k1=stats["k1"], b=stats["b"], epsilon=stats["epsilon"])
+        mmap_mode = "r" if mmap else None
+        index._terms = np.load(os.path.join(path, "bm25_terms.npy"), mmap_mode=mmap_mode)
+        index._offsets = np.load(os.path.join(path, "bm25_offsets.npy"), mmap_mode=mmap_mode)
+        index._doc_ids = np.load(os.path.join(path, "bm25_doc_ids.npy"), mmap_mode=mmap_mode)
+        index._frequencies = np.load(os.path.join(path, "bm25_frequencies.npy"), mmap_mode=mmap_mode)
+
+        # Lengths are updated on removal, so they are read into memory
+        index.doc_lengths = array('i', np.load(os.path.join(path, "bm25_doc_lengths.npy")).tobytes())
+        index._num_mapped_docs = len(index.doc_lengths)
+        index.total_length, index.num_removed = stats["total_length"], stats["num_removed"]
+        return index
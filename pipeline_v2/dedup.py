@@ -0,0 +1,143 @@
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import xxhash
+
+from bm25 import tokenize
+from storage import save_npy
+
+def content_hash(text: str) -> int:
+    """Fast 64-bit content hash of a chunk (xxh3)."""
+    return xxhash.xxh3_64_intdigest(text.encode("utf-8"))
+
+def simhash(text: str, shingle_size: int = 2) -> int:
+    """
+    64-bit SimHash over word shingles, texts differing by a few words get hashes with a small Hamming distance
+    *** params ***
+    text: text to fingerprint
+    shingle_size: number of consecutive words per shingle, after dropping stopwords (stopwords and single words are shared
+        by unrelated texts, pulling their fingerprints within a few bits of each other)
+
+    *** returns ***
+    SimHash fingerprint as an int
+    """
+    tokens = [token for token in tokenize(text) if token not in STOPWORDS]
+    shingles = [" ".join(tokens[i:i + shingle_size]) for i in range(max(len(tokens) - shingle_size + 1, 1))]
+    hashes = np.array([xxhash.xxh3_64_intdigest(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+
+    # Per bit, vote +1/-1 over all shingle hashes and keep the sign
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return int(np.packbits(votes > 0, bitorder="little").view(np.uint64)[0])
+
+class SimHashIndex:
+    """
+    Index of SimHash fingerprints for near-duplicate lookup within a maximum Hamming distance.
+    Fingerprints are split into bands; by the pigeonhole principle, two fingerprints within `max_distance`
+    bits share at least one identical band as long as `num_bands > max_distance`.
+    Entries loaded from disk stay memory-mapped as per-band sorted columns (looked up by binary search),
+    entries added afterwards go to in-memory buckets, and removed mapped entries are remembered in a set.
+    """
+    def __init__(self, max_distance: int = 3, num_bands: int = None):
+        num_bands = num_bands or max_distance + 1
+        assert num_bands > max_distance, "num_bands must exceed max_distance to guarantee recall"
+        self.max_distance = max_distance
+        self.num_bands = num_bands
+        self.band_bits = 64 // num_bands
+        self.buckets: Dict[Tuple[int, int], List[Tuple[int, int]]] = {} # (band index, band value) -> [(fingerprint, id)]
+
+        # Memory-mapped segment (empty unless loaded from disk)
+        self._fingerprints = np.zeros(0, dtype=np.uint64) # By entry
+        self._ids = np.zeros(0, dtype=np.int64) # By entry (-1 once dropped by `remap`)
+        self._band_values = np.zeros((num_bands, 0), dtype=np.uint64) # Per band, sorted band values of the entries
+        self._band_entries = np.zeros((num_bands, 0), dtype=np.int64) # Per band, entry of each sorted band value
+        self._removed: Set[int] = set() # Ids of mapped entries removed since loading
+
+    def _bands(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        return [(i, (fingerprint >> (i * self.band_bits)) & mask) for i in range(self.num_bands)]
+
+    def find(self, fingerprint: int) -> Optional[int]:
+        """Return the id of a stored fingerprint within `max_distance` bits, or None."""
+        for band in self._bands(fingerprint):
+            for other, other_id in self.buckets.get(band, []):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return other_id
+            if self._band_values.shape[1] == 0: continue
+            band_values = self._band_values[band[0]]
+            start, end = np.searchsorted(band_values, np.uint64(band[1]), side="left"), np.searchsorted(band_values, np.uint64(band[1]), side="right")
+            for entry in self._band_entries[band[0], start:end].tolist():
+                other_id = int(self._ids[entry])
+                if other_id < 0 or other_id in self._removed: continue
+                if bin(fingerprint ^ int(self._fingerprints[entry])).count("1") <= self.max_distance:
+                    return other_id
+        return None
+
+    def add(self, fingerprint: int, id: int):
+        for band in self._bands(fingerprint):
+            self.buckets.setdefault(band, []).append((fingerprint, id))
+
+    def remove(self, fingerprint: int, id: int):
+        for band in self._bands(fingerprint):
+            bucket = self.buckets.get(band, [])
+            if (fingerprint, id) in bucket: bucket.remove((fingerprint, id))
+            if len(bucket) == 0: self.buckets.pop(band, None)
+        if len(self._ids) > 0: self._removed.add(id) # In case it is a mapped entry
+
+    def remap(self, new_ids: np.ndarray):
+        """Renumber stored ids (new_ids[old id] = new id, -1 for dropped ids), e.g. after the store compacted its chunk ids."""
+        self.buckets = {band: [(fingerprint, int(new_ids[id])) for fingerprint, id in bucket] for band, bucket in self.buckets.items()}
+        if len(self._ids) > 0:
+            ids = new_ids[self._ids].astype(np.int64)
+            if self._removed: ids[np.isin(self._ids, np.array(list(self._removed), dtype=np.int64))] = -1
+            self._ids, self._removed = ids, set()
+
+    def clear(self):
+        self.buckets = {}
+        self._fingerprints, self._ids = np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+        self._band_values = np.zeros((self.num_bands, 0), dtype=np.uint64)
+        self._band_entries = np.zeros((self.num_bands, 0), dtype=np.int64)
+        self._removed = set()
+
+    def save(self, path: str):
+        """Write the fingerprint and id columns of every entry, and the per-band sorted columns, to a directory (simhash_*.npy)."""
+        alive = (self._ids >= 0) & ~np.isin(self._ids, np.array(list(self._removed), dtype=np.int64))
+        tail = [entry for (band, _), bucket in self.buckets.items() if band == 0 for entry in bucket] # Every entry is in one bucket per band
+        fingerprints = np.concatenate([self._fingerprints[alive], np.array([fingerprint for fingerprint, _ in tail], dtype=np.uint64)])
+        ids = np.concatenate([self._ids[alive], np.array([id for _, id in tail], dtype=np.int64)])
+        mask = np.uint64((1 << self.band_bits) - 1)
+        band_values = np.stack([(fingerprints >> np.uint64(i * self.band_bits)) & mask for i in range(self.num_bands)]) if len(ids) > 0 else np.zeros((self.num_bands, 0), dtype=np.uint64)
+        band_entries = np.argsort(band_values, axis=1, kind="stable")
+        save_npy(os.path.join(path, "simhash_fingerprints.npy"), fingerprints)
+        save_npy(os.path.join(path, "simhash_ids.npy"), ids)
+        save_npy(os.path.join(path, "simhash_band_values.npy"), np.take_along_axis(band_values, band_entries, axis=1))
+        save_npy(os.path.join(path, "simhash_band_entries.npy"), band_entries.astype(np.int64))
+
+    @classmethod
+    def load(cls, path: str, max_distance: int, mmap: bool = True) -> Optional["SimHashIndex"]:
+        """
+        Load entries written by `save`, memory-mapping them if `mmap` (entries banded for another distance are re-added in memory),
+        or return None if the directory has none
+        """
+        if not os.path.exists(os.path.join(path, "simhash_band_entries.npy")): return None
+        index = cls(max_distance=max_distance)
+        mmap_mode = "r" if mmap else None
+        fingerprints = np.load(os.path.join(path, "simhash_fingerprints.npy"), mmap_mode=mmap_mode)
+        ids = np.load(os.path.join(path, "simhash_ids.npy"), mmap_mode=mmap_mode)
+        band_values = np.load(os.path.join(path, "simhash_band_values.npy"), mmap_mode=mmap_mode)
+        if band_values.shape[0] != index.num_bands:
+            for fingerprint, id in zip(fingerprints.tolist(), ids.tolist()): index.add(fingerprint, id)
+            return index
+        index._fingerprints, index._ids, index._band_values = fingerprints, ids, band_values
+        index._band_entries = np.load(os.path.join(path, "simhash_band_entries.npy"), mmap_mode=mmap_mode)
+        return index
+
+# Constants for near-duplicate detection
+STOPWORDS = frozenset(( # Dropped before shingling (negations are kept, "X is not Y" must not match "X is Y")
+    "a about above after again against all am an and any are as at be because been before being below between both but by can "
+    "could did do does doing down during each few for from further had has have having he her here hers herself him himself his "
+    "how i if in into is it its itself just me more most my myself now of off on once only or other our ours ourselves "
+    "out over own same she should so some such than that the their theirs them themselves then there these they this those through "
+    "to too under until up very was we were what when where which while who whom why will with would you your yours yourself yourselves"
+).split())
@@ -0,0 +1,142 @@
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory file locks, only one process may write to a cache directory
+    fcntl = None
+
+# Process-wide registry of open caches, keyed by the real path of their files
+_caches: Dict[str, "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(cache_dir: str, model_name: str, dimension: int) -> "EmbeddingCache":
+    """Return the process's shared cache of a model's embeddings in a directory, opening it on first use."""
+    path = os.path.realpath(os.path.join(cache_dir, _file_stem(model_name)))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = EmbeddingCache(cache_dir, model_name, dimension)
+    if cache.dimension != dimension:
+        raise ValueError(f"Embedding cache {path} holds {cache.dimension}-dimensional vectors, not {dimension}")
+    return cache
+
+def _file_stem(model_name: str) -> str:
+    return re.sub(r"[^\w.-]", "_", model_name)
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of embeddings for one encoder model, keyed by chunk content hash.
+    Vectors live in a memory-mapped float32 file (`<model>.f32`) and their keys in an append-only index file
+    (`<model>.idx`, one uint64 hash per row), so cached vectors are read straight from the page cache.
+    Writers append under an exclusive lock on the index file after reading the rows other writers appended, so several
+    processes can share a directory; within a process, use get_embedding_cache so that every store shares one instance.
+    """
+    def __init__(self, cache_dir: str, model_name: str, dimension: int, growth: int = 4096):
+        self.dimension = dimension
+        self.growth = growth # Rows to grow the vector file by when it is full
+
+        os.makedirs(cache_dir, exist_ok=True)
+        file_stem = os.path.join(cache_dir, _file_stem(model_name))
+        self.vectors_path = f"{file_stem}.f32"
+        self.index_path = f"{file_stem}.idx"
+
+        # Keys of cached vectors (row i of the vector file belongs to key i)
+        self.rows: Dict[int, int] = {}
+        self._num_rows = 0 # Rows of the index file read so far (a key may repeat only where file locks are unavailable)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None
+        with self._locked_index():
+            self._refresh()
+            self._open(max(self._num_rows, 1))
+
+    @contextmanager
+    def _locked_index(self):
+        """Open the index file for appending, holding an exclusive lock on it across processes (writers take turns)."""
+        with open(self.index_path, "ab") as index_file:
+            if fcntl is not None: fcntl.flock(index_file, fcntl.LOCK_EX)
+            try:
+                yield index_file
+            finally:
+                if fcntl is not None: fcntl.flock(index_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Read keys other writers appended to the index file since it was last read."""
+        num_rows = os.path.getsize(self.index_path) // 8 # Whole keys only, a concurrent append may be half written
+        if num_rows == self._num_rows: return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._num_rows * 8)
+            keys = np.frombuffer(f.read((num_rows - self._num_rows) * 8), dtype=np.uint64)
+        for row, key in enumerate(keys.tolist(), self._num_rows):
+            self.rows.setdefault(key, row)
+        self._num_rows = num_rows
+
+    def _open(self, min_rows: int):
+        """(Re)map the vector file, growing it to hold at least `min_rows` rows."""
+        row_bytes = self.dimension * np.dtype(np.float32).itemsize
+        file_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        if file_rows < min_rows:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(max(min_rows, file_rows + self.growth) * row_bytes)
+            file_rows = os.path.getsize(self.vectors_path) // row_bytes
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(file_rows, self.dimension))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self.rows)
+
+    def get(self, keys: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Look up cached embeddings
+        *** params ***
+        keys: content hashes of the chunks
+
+        *** returns ***
+        (embeddings for the found keys as a float32 array, boolean mask of which keys were found)
+        """
+        with self._lock:
+            self._refresh()
+            rows = [self.rows.get(key, -1) for key in keys]
+            found = np.array([row >= 0 for row in rows], dtype=bool)
+            if found.any() and max(rows) >= self._vectors.shape[0]: self._open(max(rows) + 1) # Grown by another process
+            embeddings = self._vectors[[row for row in rows if row >= 0]]
+            self.hits += int(found.sum())
+            self.misses += len(keys) - int(found.sum())
+        return np.asarray(embeddings, dtype=np.float32), found
+
+    def put(self, keys: List[int], embeddings: np.ndarray):
+        """Append embeddings for keys not cached yet."""
+        with self._lock:
+            if all(key in self.rows for key in keys): return
+            with self._locked_index() as index_file:
+                # Append after the rows other writers (stores or processes) wrote since the index was last read
+                self._refresh()
+                new, seen = [], set()
+                for i, key in enumerate(keys):
+                    if key in self.rows or key in seen: continue
+                    seen.add(key)
+                    new.append((key, i))
+                if len(new) == 0: return
+
+                start = self._num_rows
+                if start + len(new) > self._vectors.shape[0]:
+                    self._vectors.flush()
+                    self._open(start + len(new))
+                self._vectors[start:start + len(new)] = embeddings if len(new) == len(embeddings) else embeddings[[i for _, i in new]]
+                self._vectors.flush()
+
+                # Keys are written after their vectors so a crash never leaves a key pointing at missing data
+                index_file.write(np.array([key for key, _ in new], dtype=np.uint64).tobytes())
+                index_file.flush()
+                for row, (key, _) in enumerate(new, start):
+                    self.rows[key] = row
+                self._num_rows = start + len(new)
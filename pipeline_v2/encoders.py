@@ -0,0 +1,274 @@
+import os
+import re
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Literal, Optional, Tuple, Union
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+EncoderBackend = Literal["torch", "onnx", "onnx-int8"]
+
+# Process-wide registry of loaded encoders, keyed by (model name, device, backend)
+_encoders: Dict[Tuple[str, Optional[str], str], SentenceTransformer] = {}
+_load_stats: Dict[Tuple[str, Optional[str], str], Dict] = {}
+_load_locks: Dict[Tuple[str, Optional[str], str], threading.Lock] = {}
+_batching_encoders: Dict[Tuple[str, Optional[str], str], "BatchingEncoder"] = {}
+_registry_lock = threading.Lock()
+
+def get_encoder(model_name: str, device: Optional[str] = None, backend: EncoderBackend = "torch", verbose: bool = False) -> SentenceTransformer:
+    """
+    Return the shared encoder for a model, loading it on first use
+    *** params ***
+    model_name: Sentence Transformers model name or path
+    device: device to load the model on (None for the library default)
+    backend: "torch" (PyTorch), "onnx" (ONNX Runtime on CPU) or "onnx-int8" (ONNX Runtime with dynamically int8-quantized weights),
+        all producing embeddings of the same model, so stores and caches built with one backend can be searched with another
+    verbose: print load time and weight memory when this call loads the model
+
+    *** returns ***
+    SentenceTransformer shared by every caller in the process (encoding is read-only, so concurrent callers can share it)
+    """
+    key = (model_name, device, backend)
+    encoder = _encoders.get(key)
+    if encoder is not None: return encoder
+
+    # Callers of the same model wait for a single load, different models load in parallel
+    with _registry_lock:
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+    with load_lock:
+        if key not in _encoders:
+            start = time.perf_counter()
+            if backend == "torch":
+                encoder = SentenceTransformer(model_name, device=device)
+            elif backend == "onnx":
+                encoder = SentenceTransformer(model_name, device=device, backend="onnx")
+            elif backend == "onnx-int8":
+                encoder = _load_int8_onnx_encoder(model_name, device)
+            else:
+                raise ValueError(f"Unknown encoder backend: {backend}")
+            load_seconds = time.perf_counter() - start
+            model_bytes = _model_bytes(encoder)
+            _load_stats[key] = {
+                "model_name": model_name,
+                "device": str(encoder.device),
+                "backend": backend,
+                "load_seconds": load_seconds,
+                "parameter_bytes": model_bytes,
+            }
+            _encoders[key] = encoder
+            if verbose: print(f"Loaded {backend} encoder {model_name} on {encoder.device} in {load_seconds:.1f}s ({model_bytes / 2**20:.0f} MB)")
+    return _encoders[key]
+
+def _load_int8_onnx_encoder(model_name: str, device: Optional[str]) -> SentenceTransformer:
+    """Load the int8 ONNX graph of a model, exporting and quantizing it into ONNX_EXPORT_DIR the first time."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    export_dir = os.path.join(ONNX_EXPORT_DIR, re.sub(r"[^\w.-]", "_", model_name))
+    file_name = f"onnx/model_qint8_{ONNX_QUANTIZATION_CONFIG}.onnx"
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        encoder = SentenceTransformer(model_name, device=device, backend="onnx")
+        encoder.save(export_dir) # Float32 graph, tokenizer and pooling/normalization modules
+        export_dynamic_quantized_onnx_model(encoder, ONNX_QUANTIZATION_CONFIG, export_dir, file_suffix=f"qint8_{ONNX_QUANTIZATION_CONFIG}")
+    return SentenceTransformer(export_dir, device=device, backend="onnx", model_kwargs={"file_name": file_name})
+
+def _model_bytes(encoder: SentenceTransformer) -> int:
+    """Size of a model's weights: PyTorch parameters and buffers, or the ONNX graph file."""
+    model_bytes = sum(tensor.numel() * tensor.element_size() for tensor in list(encoder.parameters()) + list(encoder.buffers()))
+    model_path = getattr(getattr(encoder[0], "auto_model", None), "model_path", None) # ONNX Runtime models keep no torch parameters
+    if model_path is not None and os.path.exists(model_path): model_bytes += os.path.getsize(model_path)
+    return model_bytes
+
+def encoder_stats() -> Dict[str, Dict]:
+    """Return load time and weight memory of every loaded encoder, by model name (and device/backend if not the default)."""
+    return {
+        model_name + (f"@{device}" if device is not None else "") + (f" [{backend}]" if backend != "torch" else ""): dict(stats)
+        for (model_name, device, backend), stats in _load_stats.items()
+    }
+
+def unload_encoder(model_name: str, device: Optional[str] = None, backend: EncoderBackend = "torch"):
+    """Drop the registry's references to an encoder and stop its micro-batching worker (memory is freed once no store still uses it)."""
+    key = (model_name, device, backend)
+    with _registry_lock:
+        _encoders.pop(key, None)
+        _load_stats.pop(key, None)
+        batching_encoder = _batching_encoders.pop(key, None)
+    if batching_encoder is not None: batching_encoder.close()
+
+def encode_float32(encoder, sentences: List[str], batch_size: int = 32, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Encode sentences batch by batch straight into one C-contiguous float32 array that FAISS can use without copying
+    (instead of the encoder collecting every row and stacking them into a tensor or array at the end)
+    *** params ***
+    encoder: SentenceTransformer or BatchingEncoder
+    sentences: texts to encode
+    batch_size: sentences per encoder call
+    out: preallocated (len(sentences), dimension) float32 array to write into (allocated if None)
+
+    *** returns ***
+    out, row i holding the embedding of sentences[i]
+    """
+    if out is None: out = np.empty((len(sentences), encoder.get_sentence_embedding_dimension()), dtype=np.float32)
+    # Longest first, like SentenceTransformer.encode, so each batch pads to similar lengths
+    order = sorted(range(len(sentences)), key=lambda i: -len(sentences[i]))
+    for start in range(0, len(order), batch_size):
+        rows = order[start:start + batch_size]
+        out[rows] = encoder.encode([sentences[i] for i in rows], batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return out
+
+class BatchingEncoder:
+    """
+    Encoding front-end that merges concurrent encode calls from many threads into micro-batches.
+    Requests are queued, and a worker thread takes everything that arrives within `max_wait` seconds of the first request
+    (up to `max_batch_size` sentences), encodes it in one model call and resolves each caller's future with its rows.
+    Drop-in for SentenceTransformer.encode returning float32 numpy arrays, other attributes are those of the wrapped model.
+    After `close`, calls encode with the wrapped model directly.
+    """
+    def __init__(self, encoder: SentenceTransformer, max_batch_size: int = 64, max_wait: float = 0.005):
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self.num_requests = 0
+        self.num_batches = 0
+        self.num_sentences = 0
+        self.max_batch_sentences = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0 # Seconds requests spent queued before their batch started
+
+        self._requests = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def __getattr__(self, name):
+        if name == "encoder": raise AttributeError(name)
+        return getattr(self.encoder, name)
+
+    def encode(self, sentences: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """Encode sentences as part of the next micro-batch (kwargs other than batching/output options are passed to the model)."""
+        single = isinstance(sentences, str)
+        if single: sentences = [sentences]
+        convert_to_tensor = kwargs.pop("convert_to_tensor", False)
+        for option in ("batch_size", "convert_to_numpy", "show_progress_bar"): kwargs.pop(option, None)
+        if len(sentences) == 0:
+            return np.zeros((0, self.encoder.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        with self._stats_lock:
+            closed = self._closed
+            if not closed:
+                future = Future()
+                self._requests.put((list(sentences), tuple(sorted(kwargs.items())), future, time.perf_counter()))
+                self.num_requests += 1
+                self.max_queue_depth = max(self.max_queue_depth, self._requests.qsize())
+        if closed:
+            embeddings = self.encoder.encode(list(sentences), convert_to_numpy=True, **kwargs).astype(np.float32, copy=False)
+        else:
+            embeddings = future.result()
+        if convert_to_tensor:
+            import torch
+            embeddings = torch.from_numpy(embeddings)
+        return embeddings[0] if single else embeddings
+
+    def close(self):
+        """Stop the worker thread once it has encoded the requests already queued."""
+        with self._stats_lock:
+            if self._closed: return
+            self._closed = True
+            self._requests.put(None) # Sentinel, queued after every request
+        self._worker.join()
+
+    def _run(self):
+        pending = None # Request taken from the queue that did not fit into the previous batch
+        stopping = False
+        while not stopping:
+            request = pending or self._requests.get()
+            if request is None: return
+            batch = [request]
+            num_sentences = len(request[0])
+            deadline = time.perf_counter() + self.max_wait
+            pending = None
+            while num_sentences < self.max_batch_size:
+                try:
+                    request = self._requests.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                if num_sentences + len(request[0]) > self.max_batch_size:
+                    pending = request
+                    break
+                batch.append(request)
+                num_sentences += len(request[0])
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: List[Tuple]):
+        start = time.perf_counter()
+        with self._stats_lock:
+            self.num_batches += 1
+            self.num_sentences += sum(len(sentences) for sentences, _, _, _ in batch)
+            self.max_batch_sentences = max(self.max_batch_sentences, sum(len(sentences) for sentences, _, _, _ in batch))
+            self.total_wait += sum(start - queued_at for _, _, _, queued_at in batch)
+
+        # One model call per distinct set of encode options in the batch
+        by_options: Dict[Tuple, List[Tuple]] = {}
+        for request in batch: by_options.setdefault(request[1], []).append(request)
+        for options, requests in by_options.items():
+            try:
+                embeddings = self.encoder.encode(
+                    [sentence for sentences, _, _, _ in requests for sentence in sentences],
+                    batch_size=max(self.max_batch_size, 1),
+                    convert_to_numpy=True,
+                    **dict(options)
+                ).astype(np.float32, copy=False)
+            except Exception as e:
+                for _, _, future, _ in requests: future.set_exception(e)
+                continue
+            offset = 0
+            for sentences, _, future, _ in requests:
+                future.set_result(embeddings[offset:offset + len(sentences)])
+                offset += len(sentences)
+
+    def stats(self) -> Dict[str, float]:
+        """Return request/batch counts, batch sizes and queue depth."""
+        with self._stats_lock:
+            return {
+                "requests": self.num_requests,
+                "batches": self.num_batches,
+                "sentences": self.num_sentences,
+                "mean_batch_sentences": self.num_sentences / self.num_batches if self.num_batches else 0.0,
+                "max_batch_sentences": self.max_batch_sentences,
+                "mean_requests_per_batch": self.num_requests / self.num_batches if self.num_batches else 0.0,
+                "queue_depth": self._requests.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "mean_wait_ms": self.total_wait / self.num_requests * 1000 if self.num_requests else 0.0,
+            }
+
+def get_batching_encoder(
+    model_name: str, 
+    device: Optional[str] = None, 
+    backend: EncoderBackend = "torch", 
+    max_batch_size: int = 64, 
+    max_wait: float = 0.005,
+    verbose: bool = False
+) -> BatchingEncoder:
+    """Return the shared micro-batching front-end of a model (batching options only apply when it is first created)."""
+    key = (model_name, device, backend)
+    with _registry_lock:
+        batching_encoder = _batching_encoders.get(key)
+    if batching_encoder is not None: return batching_encoder
+
+    encoder = get_encoder(model_name, device, backend, verbose=verbose)
+    with _registry_lock:
+        if key not in _batching_encoders:
+            _batching_encoders[key] = BatchingEncoder(encoder, max_batch_size=max_batch_size, max_wait=max_wait)
+        return _batching_encoders[key]
+
+# Constants for the ONNX backends
+ONNX_EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "onnx") # Where int8 ONNX graphs are exported to
+ONNX_QUANTIZATION_CONFIG = "avx2" # ONNX Runtime dynamic quantization preset for the CPUs we run on ("arm64", "avx2", "avx512" or "avx512_vnni")
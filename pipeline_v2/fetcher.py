@@ -0,0 +1,151 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from html_extract import extract_text
+
+class PageFetcher:
+    """
+    Concurrent fetcher of full web pages, running one pooled aiohttp session on a background event loop so that
+    threaded callers can consume pages as they arrive (e.g. embedding one page while the others are still downloading).
+    Connections are capped overall and per host, bodies are streamed and cut off at `max_bytes`,
+    and each request (including reading its body) is bounded by `timeout` seconds from when it gets its connection slot,
+    so pages queued behind others of the same host do not time out before they are sent.
+    """
+    def __init__(
+        self,
+        timeout: float = 5.0, # Seconds per page, from connecting to reading the last byte (time queued for a connection slot is not counted)
+        max_connections: int = 32, # Simultaneous requests overall
+        max_per_host: int = 2, # Simultaneous requests per host, to stay polite to (and not get blocked by) any single site
+        max_bytes: int = 2 * 2**20, # Bytes read per page, longer pages are truncated
+        extract: Callable[[str], str] = extract_text, # HTML -> text, run in a thread so parsing does not stall downloads
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.max_bytes = max_bytes
+        self.extract = extract
+
+        # Event loop and session are started on first use
+        self._loop = None
+        self._session = None
+        self._start_lock = threading.Lock()
+
+        # Connection slots, overall and per host (only used on the event loop thread)
+        self._connection_slots = None
+        self._host_slots: Dict[str, List] = {} # Host -> [semaphore, requests using or waiting for it]
+
+        # Counters (only updated on the event loop thread)
+        self.num_fetched = 0
+        self.num_failed = 0
+        self.num_truncated = 0
+        self.num_bytes = 0
+        self.total_seconds = 0.0
+
+    def _start(self):
+        with self._start_lock:
+            if self._loop is not None: return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            self._session = asyncio.run_coroutine_threadsafe(self._create_session(), loop).result()
+            self._loop = loop
+
+    async def _create_session(self) -> aiohttp.ClientSession:
+        self._connection_slots = asyncio.Semaphore(self.max_connections)
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host, ttl_dns_cache=300)
+        # No session timeout: aiohttp's would include the wait for a pooled connection, _fetch times requests once they have a slot
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None), headers=FETCH_HEADERS)
+
+    def fetch_many(self, urls: List[str]) -> Iterator[Tuple[str, str]]:
+        """
+        Fetch pages concurrently and extract their text
+        *** params ***
+        urls: page URLs (duplicates are fetched once)
+
+        *** returns ***
+        Iterator of (url, text) in order of completion, skipping pages that failed, were not HTML/text, or had no text
+        """
+        if len(urls) == 0: return
+        self._start()
+        futures = {asyncio.run_coroutine_threadsafe(self._fetch(url), self._loop): url for url in dict.fromkeys(urls)}
+        for future in as_completed(futures):
+            text = future.result()
+            if text: yield futures[future], text
+
+    async def _fetch(self, url: str) -> Optional[str]:
+        # Wait for a slot of the page's host, then for one overall (in this order, so requests queued behind a busy host
+        # do not hold slots other hosts could use), and only then start the page's timeout
+        host = urlsplit(url).netloc
+        host_slot = self._host_slots.setdefault(host, [asyncio.Semaphore(self.max_per_host), 0])
+        host_slot[1] += 1
+        try:
+            async with host_slot[0], self._connection_slots:
+                start = time.perf_counter()
+                try:
+                    download = await asyncio.wait_for(self._download(url), self.timeout)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    self.num_failed += 1
+                    return None
+                finally:
+                    self.total_seconds += time.perf_counter() - start
+        finally:
+            host_slot[1] -= 1
+            if host_slot[1] == 0: del self._host_slots[host]
+        if download is None:
+            self.num_failed += 1
+            return None
+
+        body, encoding, content_type = download
+        try:
+            page = body.decode(encoding, errors="replace")
+        except LookupError: # Unknown charset in the headers
+            page = body.decode("utf-8", errors="replace")
+        self.num_fetched += 1
+        self.num_bytes += len(body)
+        if content_type.startswith("text/plain"): return page
+        return await asyncio.get_running_loop().run_in_executor(None, self.extract, page)
+
+    async def _download(self, url: str) -> Optional[Tuple[bytearray, str, str]]:
+        """Request a page and read its body, returning (body, charset, content type), or None if it is not an HTML/text page."""
+        async with self._session.get(url) as response:
+            content_type = response.headers.get("Content-Type", "").lower()
+            if response.status != 200 or not content_type.startswith(FETCH_CONTENT_TYPES): return None
+
+            # Stream the body, stopping at max_bytes instead of downloading (and buffering) huge pages
+            body = bytearray()
+            async for block in response.content.iter_chunked(64 * 1024):
+                body += block
+                if len(body) >= self.max_bytes:
+                    del body[self.max_bytes:]
+                    self.num_truncated += 1
+                    break
+            return body, response.charset or "utf-8", content_type
+
+    def stats(self) -> Dict[str, float]:
+        """Return fetched/failed/truncated page counts, bytes read and mean request time."""
+        num_requests = self.num_fetched + self.num_failed
+        return {
+            "fetched": self.num_fetched,
+            "failed": self.num_failed,
+            "truncated": self.num_truncated,
+            "bytes": self.num_bytes,
+            "mean_ms": self.total_seconds / num_requests * 1000 if num_requests else 0.0,
+        }
+
+    def close(self):
+        """Close the session and stop the event loop."""
+        with self._start_lock:
+            if self._loop is None: return
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop, self._session = None, None
+            self._connection_slots, self._host_slots = None, {}
+
+# Constants for fetching
+FETCH_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0"}
+FETCH_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain") # Other content (PDFs, images, ...) is skipped
@@ -0,0 +1,180 @@
+import re
+from typing import List, Tuple, Union
+
+import lxml.html
+from lxml import etree
+
+# (paragraph text, start offset, end offset) into the text returned by extract_text
+Paragraph = Tuple[str, int, int]
+
+_utf8_parser = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+_parser = lxml.html.HTMLParser(remove_comments=True, remove_pis=True)
+
+def extract_paragraphs(html: Union[str, bytes]) -> List[Paragraph]:
+    """
+    Extract the main content of an HTML page as clean paragraphs, dropping boilerplate
+    (navigation, headers and footers, cookie banners, sidebars, share buttons, link lists, ...)
+    *** params ***
+    html: page source (bytes are decoded by lxml from the page's declared charset)
+
+    *** returns ***
+    List of (text, start, end) per paragraph in page order, with offsets into the text returned by extract_text
+    (paragraphs joined by blank lines), so chunks of that text can be traced back to their paragraphs
+    """
+    root = _parse(html)
+    if root is None: return []
+    _remove_boilerplate(root)
+    body = root.find("body")
+    blocks = _blocks(body if body is not None else root)
+
+    # Keep blocks that read like prose, then headings of sections (or of kept subheadings) with kept prose
+    keep = [not heading and _is_content(text, link_chars) for text, link_chars, heading, _ in blocks]
+    section_kept = False
+    for i in range(len(blocks) - 1, -1, -1):
+        text, link_chars, heading, _ = blocks[i]
+        if not heading:
+            section_kept = section_kept or keep[i]
+            continue
+        keep[i] = section_kept and link_chars <= len(text) * MAX_LINK_DENSITY
+        section_kept = keep[i]
+
+    # Restrict to the main content container when the page marks one holding most of the content
+    chars_by_container = {}
+    for (text, _, _, container), kept in zip(blocks, keep):
+        if kept and container is not None: chars_by_container[container] = chars_by_container.get(container, 0) + len(text)
+    if chars_by_container:
+        main = max(chars_by_container, key=chars_by_container.get)
+        if chars_by_container[main] >= MIN_MAIN_CONTENT_SHARE * sum(len(block[0]) for block, kept in zip(blocks, keep) if kept):
+            keep = [kept and block[3] == main for block, kept in zip(blocks, keep)]
+
+    paragraphs, offset = [], 0
+    for (text, _, _, _), kept in zip(blocks, keep):
+        if not kept: continue
+        paragraphs.append((text, offset, offset + len(text)))
+        offset += len(text) + len(PARAGRAPH_SEPARATOR)
+    return paragraphs
+
+def extract_text(html: Union[str, bytes]) -> str:
+    """Extract the main content of an HTML page as plain text, one paragraph per block separated by blank lines."""
+    return PARAGRAPH_SEPARATOR.join(text for text, _, _ in extract_paragraphs(html))
+
+def _parse(html: Union[str, bytes]):
+    if isinstance(html, str):
+        # lxml rejects unicode strings with an XML encoding declaration, parse them as UTF-8 bytes instead
+        html, parser = html.encode("utf-8", errors="replace"), _utf8_parser
+    else:
+        parser = _parser
+    try:
+        return lxml.html.document_fromstring(html, parser=parser)
+    except (etree.ParserError, ValueError): # Empty or unparsable page
+        return None
+
+def _remove_boilerplate(root):
+    """Remove non-content elements and elements whose tag, role, id or class marks them as boilerplate."""
+    etree.strip_elements(root, *REMOVED_TAGS, with_tail=False)
+    boilerplate = []
+    for element in root.iter(*BOILERPLATE_TAGS, "div", "section", "ul", "ol", "table", "p", "span", "form", "dl"):
+        if element.tag in BOILERPLATE_TAGS:
+            # <header>/<footer> inside an article are usually its title and byline, only remove page-level ones
+            if element.tag in ("header", "footer"):
+                if any(ancestor.tag in ("article", "main") for ancestor in element.iterancestors()): continue
+            boilerplate.append(element)
+            continue
+        if element.get("role") in BOILERPLATE_ROLES or element.get("aria-hidden") == "true" or element.get("hidden") is not None:
+            boilerplate.append(element)
+            continue
+        if HIDDEN_STYLE.search(element.get("style", "")):
+            boilerplate.append(element)
+            continue
+        names = f"{element.get('id', '')} {element.get('class', '')}"
+        if not names.strip(): continue
+        if POPUP_NAMES.search(names) or (BOILERPLATE_NAMES.search(names) and not CONTENT_NAMES.search(names)):
+            # Never drop a wrapper of the main content (e.g. <div class="page has-sidebar"> around the <article>)
+            if not any(True for _ in element.iter("article", "main")): boilerplate.append(element)
+    for element in boilerplate:
+        if element.getparent() is not None: element.drop_tree() # Keeps the tail text, which belongs to the parent
+    return root
+
+def _blocks(root) -> List[Tuple[str, int, bool, object]]:
+    """
+    Split the text under `root` into blocks at block-level tags
+    *** returns ***
+    List of (whitespace-normalized text, characters inside links, is heading, outermost main content container or None) per non-empty block
+    """
+    blocks = []
+    parts, link_chars = [], 0
+    link_depth, heading_depth = 0, 0
+    containers = [] # Open main content containers
+
+    def flush():
+        nonlocal parts, link_chars
+        text = " ".join("".join(parts).split()) # Normalize whitespace (much faster than a regex substitution)
+        if text:
+            blocks.append((text, min(link_chars, len(text)), heading_depth > 0, containers[0] if containers else None))
+        parts, link_chars = [], 0
+
+    def add(text, in_link):
+        nonlocal link_chars
+        if not text: return
+        parts.append(text)
+        if in_link: link_chars += len(text.strip())
+
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag in BLOCK_TAGS: flush()
+            if tag in HEADING_TAGS: heading_depth += 1
+            if tag == "a": link_depth += 1
+            elif tag == "br": parts.append(" ")
+            if tag in MAIN_CONTENT_TAGS or element.get("role") == "main" or element.get("itemprop") == "articleBody": containers.append(element)
+            add(element.text, link_depth > 0)
+        else:
+            if tag in BLOCK_TAGS: flush()
+            if tag in HEADING_TAGS: heading_depth -= 1
+            if tag == "a": link_depth -= 1
+            if containers and containers[-1] is element: containers.pop()
+            if element is not root: add(element.tail, link_depth > 0) # Tail text continues the parent's block
+    flush()
+    return blocks
+
+def _is_content(text: str, link_chars: int) -> bool:
+    """Whether a block reads like prose rather than navigation, buttons, labels or link lists."""
+    if link_chars > len(text) * MAX_LINK_DENSITY: return False
+    if len(text) <= MAX_BOILERPLATE_TEXT_CHARS and BOILERPLATE_TEXT.search(text): return False
+    num_words = text.count(" ") + 1 # Whitespace is already normalized
+    return num_words >= MIN_PARAGRAPH_WORDS or (num_words >= MIN_SENTENCE_WORDS and text[-1] in SENTENCE_END)
+
+# Constants for HTML extraction
+PARAGRAPH_SEPARATOR = "\n\n"
+MIN_PARAGRAPH_WORDS = 10 # Blocks with at least this many words are kept as content (unless mostly links)
+MIN_SENTENCE_WORDS = 4 # Shorter blocks are kept only if they are a complete sentence of at least this many words
+MAX_LINK_DENSITY = 0.4 # Maximum fraction of a block's text inside links
+MIN_MAIN_CONTENT_SHARE = 0.5 # Minimum share of the content inside an <article>/<main> element to drop the content outside it
+MAX_BOILERPLATE_TEXT_CHARS = 200 # Only blocks up to this length are checked for boilerplate text (copyright lines, cookie notices)
+SENTENCE_END = '.!?:;"”'
+HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+REMOVED_TAGS = (
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "embed", "video", "audio",
+    "button", "input", "select", "textarea", "label", "option",
+)
+BOILERPLATE_TAGS = ("nav", "aside", "header", "footer", "menu", "dialog")
+BOILERPLATE_ROLES = ("navigation", "banner", "contentinfo", "complementary", "menu", "menubar", "dialog", "alert", "search")
+POPUP_NAMES = re.compile( # Always boilerplate, even inside content containers
+    r"cookie|consent|gdpr|newsletter|subscribe|signup|sign-up|paywall|popup|modal|overlay|"
+    r"advert|\bads?\b|-ad-|sponsor|promo|skip-link|screen-reader|sr-only|visually-hidden|print-only",
+    re.IGNORECASE,
+)
+BOILERPLATE_NAMES = re.compile( # Boilerplate unless also named as content (e.g. "main-content sidebar-layout")
+    r"banner|\bnav|nav\b|menu|breadcrumb|sidebar|footer|masthead|header|related|recommend|comment|disqus|widget|"
+    r"share|sharing|social|pagination|pager|tags|toolbar|rss",
+    re.IGNORECASE,
+)
+CONTENT_NAMES = re.compile(r"article|main|content|entry|story|post-body|body-text|text-body", re.IGNORECASE)
+BOILERPLATE_TEXT = re.compile(r"^(©|\(c\)|copyright\b)|all rights reserved|cookies? (policy|settings)|accept (all )?cookies", re.IGNORECASE)
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+MAIN_CONTENT_TAGS = {"article", "main"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd", "table", "tr", "td", "th", "thead", "tbody",
+    "blockquote", "pre", "figure", "figcaption", "caption", "address", "hr", "body", "details", "summary", "center",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+}
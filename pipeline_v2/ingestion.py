@@ -0,0 +1,84 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils import chunk_text, token_chunk_spans
+from dedup import content_hash, simhash
+
+# (text, content hash, tokens or -1 if not chunked by tokens, SimHash fingerprint or None if not requested)
+Chunk = Tuple[str, int, int, Optional[int]]
+
+# Process pools shared by all stores, keyed by number of workers
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def chunk_documents(
+    documents: List[str],
+    max_chunk_size: int = 1000,
+    max_chunk_overlap: int = 100,
+    tokenizer = None, # Fast tokenizer to chunk by tokens instead of characters
+    max_chunk_tokens: Optional[int] = None,
+    max_chunk_overlap_tokens: int = 0,
+    fingerprints: bool = False, # Also compute SimHash fingerprints for near-duplicate detection
+) -> List[List[Chunk]]:
+    """
+    Chunk, hash and optionally fingerprint documents in the calling thread (also the task run by worker processes)
+    *** returns ***
+    List of chunks per document
+    """
+    if tokenizer is not None:
+        chunked_docs = [
+            [(document[start:end], num_tokens) for start, end, num_tokens in spans]
+            for document, spans in zip(documents, token_chunk_spans(documents, tokenizer, max_chunk_tokens, max_chunk_overlap_tokens))
+        ]
+    else:
+        chunked_docs = [[(chunk, -1) for chunk in chunk_text(document, max_chunk_size, max_chunk_overlap)] for document in documents]
+    return [
+        [(chunk, content_hash(chunk), num_tokens, simhash(chunk) if fingerprints else None) for chunk, num_tokens in doc_chunks]
+        for doc_chunks in chunked_docs
+    ]
+
+def iter_chunked_documents(documents: List[str], num_workers: Optional[int] = None, **options) -> Iterator[Tuple[int, List[List[Chunk]]]]:
+    """
+    Chunk documents in worker processes, yielding groups of consecutive documents in order as soon as each is done,
+    so callers can encode the first groups while later ones are still being chunked.
+    Inputs too small to pay for sending them to other processes are chunked in the calling thread as a single group.
+    *** params ***
+    documents: document texts
+    num_workers: worker processes (None for one per CPU, 1 to always chunk in the calling thread)
+    options: chunking options of chunk_documents
+
+    *** returns ***
+    Iterator of (index of the group's first document, chunks per document of the group)
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    num_chars = sum(len(document) for document in documents)
+    num_groups = min(num_workers * GROUPS_PER_WORKER, len(documents), num_chars // MIN_CHARS_PER_GROUP)
+    if num_workers == 1 or num_groups < 2:
+        yield 0, chunk_documents(documents, **options)
+        return
+
+    # Consecutive groups of roughly equal size in characters
+    bounds, group_chars, start = [], 0, 0
+    for i, document in enumerate(documents):
+        group_chars += len(document)
+        if group_chars >= num_chars / num_groups or i == len(documents) - 1:
+            bounds.append((start, i + 1))
+            group_chars, start = 0, i + 1
+
+    pool = get_process_pool(num_workers)
+    futures = [pool.submit(chunk_documents, documents[start:end], **options) for start, end in bounds]
+    for (start, _), future in zip(bounds, futures):
+        yield start, future.result()
+
+def get_process_pool(num_workers: int) -> ProcessPoolExecutor:
+    """Return the shared pool of `num_workers` processes, starting it on first use."""
+    with _pools_lock:
+        if num_workers not in _pools:
+            _pools[num_workers] = ProcessPoolExecutor(max_workers=num_workers)
+        return _pools[num_workers]
+
+# Constants for parallel ingestion
+MIN_CHARS_PER_GROUP = 100000 # Smallest group of documents worth chunking in another process (smaller inputs are chunked in the calling thread)
+GROUPS_PER_WORKER = 2 # Groups per worker process, so the first groups come back (and are encoded) while the rest are still being chunked
@@ -13,12 +13,12 @@ import faiss
 from tqdm import tqdm
 from rank_bm25 import BM25Okapi
 import json_repair
-from sentence_transformers import SentenceTransformer
 
 from urllib.parse import urlparse
 from duckduckgo_search import DDGS
 
 from utils import chunk_text, print_header, retry_function
+from encoders import get_encoder
 
 @dataclass
 class Document:
@@ -213,7 +213,7 @@ class VectorStore:
         use_bm25: bool = False,
         bm25_weight: float = 0.5
     ):
-        self.encoder = SentenceTransformer(model_name)
+        self.encoder = get_encoder(model_name, verbose=VERBOSE) # Shared across stores and pipelines in the process
         self.use_bm25 = use_bm25
         self.bm25_weight = bm25_weight
         self.max_chunk_size = max_chunk_size
@@ -1,30 +1,44 @@
 import os
+import copy
 import json
+import time
 import requests
-import itertools
+import threading
 from termcolor import colored
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, replace
 from urllib.parse import urlparse
-from typing import List, Dict, Literal, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Literal, Optional, Set, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import dspy
 import faiss
+import numpy as np
 from tqdm import tqdm
-from rank_bm25 import BM25Okapi
 import json_repair
-from sentence_transformers import SentenceTransformer
 
 from urllib.parse import urlparse
 from duckduckgo_search import DDGS
 
-from utils import chunk_text, print_header, retry_function
+from utils import normalize_query, print_header, retry_function
+from search_cache import SearchCache
+from bm25 import BM25Index
+from dedup import SimHashIndex, content_hash, simhash
+from embedding_cache import EmbeddingCache, get_embedding_cache
+from ingestion import iter_chunked_documents
+from fetcher import PageFetcher
+from encoders import EncoderBackend, encode_float32, get_batching_encoder, get_encoder
+from ann import build_index, code_size, filtered_search_parameters, is_flat, load_inverted_lists, mappable_index, remap_ids, set_search_parameters, stored_vectors
+from rwlock import ReadWriteLock
+from storage import ChunkIdIndex, ChunkStore
 
 @dataclass
 class Document:
     content: str
     metadata: Dict[str, str]
     score: float = None
+    chunk_id: Optional[int] = None # id of the chunk in the vector store it was retrieved from
+    num_tokens: Optional[int] = None # Length of the content in tokens of the embedding model's tokenizer (if chunked by tokens)
+    content_hash: Optional[int] = None # Hash of the content, which unlike chunk_id does not change when the store is compacted
 
 @dataclass
 class Citation:
@@ -63,19 +77,83 @@ class SearchResult:
     timestamp: Optional[str] = None
 
 class SearchProvider:
-    def __init__(self, provider: str = "serper", api_key: str = None):
-        self.session = requests.Session()
+    def __init__(self, provider: str = "serper", api_key: str = None, use_cache: bool = True, max_concurrency: int = None):
         self.provider = provider
         self.api_key = api_key
+
+        # Cap on simultaneous requests to the provider (shared by all threads using this instance)
+        self.max_concurrency = max_concurrency or MAX_CONCURRENT_SEARCHES.get(provider, 1)
+        self._request_slots = threading.BoundedSemaphore(self.max_concurrency)
+
+        # Session shared across threads, with a connection pool large enough for the concurrency cap
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_concurrency, pool_maxsize=self.max_concurrency)
+        self.session.mount("https://", adapter)
+
+        # On-disk cache of raw search results shared across runs (e.g. repeated trials of the same statement)
+        self.cache = SearchCache(
+            SEARCH_CACHE_PATH, 
+            ttl=SEARCH_CACHE_TTL, 
+            max_entries=SEARCH_CACHE_MAX_ENTRIES
+        ) if use_cache else None
         
+        # Single-flight state: concurrent callers asking for the same normalized query share one request
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.num_searches = 0 # Searches actually executed
+        self.num_coalesced = 0 # Search calls served by another caller's identical search
+
+    def search_many(self, queries: List[str], num_results: int = 5) -> Dict[str, List[SearchResult]]:
+        """Search all queries concurrently (bounded by the provider's concurrency cap), returning results keyed by query."""
+        # Only search each normalized query once, all of its variants share the same result list
+        queries_by_key = {}
+        for query in queries:
+            queries_by_key.setdefault(normalize_query(query), []).append(query)
+        with self._inflight_lock:
+            self.num_coalesced += len(queries) - len(queries_by_key)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            unique_queries = [variants[0] for variants in queries_by_key.values()]
+            results = executor.map(lambda query: retry_function(self.search, query, num_results), unique_queries)
+            return {
+                query: result
+                for variants, result in zip(queries_by_key.values(), results)
+                for query in variants
+            }
+
     def search(self, query: str, num_results: int = 5) -> List[SearchResult]:
-        # Choose search provider
-        if self.provider == "serper":
-            results = self._serper_search(query, num_results)
-        elif self.provider == "duckduckgo":
-            results = self._duckduckgo_search(query, num_results)
-        else:
-            raise ValueError(f"Unsupported search provider: {self.provider}")
+        key = (normalize_query(query), num_results)
+
+        # Join an identical search already in flight, if any
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[key] = Future()
+                self.num_searches += 1
+            else:
+                self.num_coalesced += 1
+        if not is_leader:
+            return future.result()
+
+        try:
+            future.set_result(self._search(query, num_results))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return future.result()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of executed and coalesced searches (and cache counters if caching is enabled)."""
+        stats = {"searches": self.num_searches, "coalesced": self.num_coalesced}
+        if self.cache is not None:
+            stats.update({f"cache_{name}": value for name, value in self.cache.stats().items()})
+        return stats
+
+    def _search(self, query: str, num_results: int) -> List[SearchResult]:
+        results = self._cached_search(query, num_results)
 
         filtered_results = self._filter_and_rank_results(results)
 
@@ -90,6 +168,28 @@ class SearchProvider:
 
         return filtered_results
 
+    def _cached_search(self, query: str, num_results: int) -> List[SearchResult]:
+        """Return raw (unfiltered) search results, served from the on-disk cache when possible."""
+        if self.cache is not None:
+            cached_results = self.cache.get(self.provider, query, num_results)
+            if cached_results is not None:
+                return [SearchResult(**result) for result in cached_results]
+
+        # Choose search provider
+        with self._request_slots:
+            if self.provider == "serper":
+                results = self._serper_search(query, num_results)
+            elif self.provider == "duckduckgo":
+                results = self._duckduckgo_search(query, num_results)
+            else:
+                raise ValueError(f"Unsupported search provider: {self.provider}")
+
+        # Only cache successful searches (errors are returned as empty lists)
+        if self.cache is not None and len(results) > 0:
+            self.cache.set(self.provider, query, num_results, [asdict(result) for result in results])
+
+        return results
+
     def _serper_search(self, query: str, num_results: int) -> List[SearchResult]:
         """
         use serper API for the given query and return search results
@@ -228,117 +328,635 @@ class VectorStore:
         model_name: str,
         max_chunk_size: int = 1000,
         max_chunk_overlap: int = 100,
+        chunking: Literal["characters", "tokens"] = "characters", # Size chunks in characters, or in tokens of the encoder's tokenizer so no chunk is truncated when embedded
+        max_chunk_tokens: Optional[int] = None, # Max tokens per chunk when chunking by tokens (None for the encoder's max sequence length)
+        max_chunk_overlap_tokens: int = 25, # Max overlap between chunks in tokens when chunking by tokens
         use_bm25: bool = False,
-        bm25_weight: float = 0.5
+        bm25_weight: float = 0.5,
+        fusion: Literal["weighted", "minmax", "rrf"] = "weighted", # How dense and BM25 scores are combined
+        near_duplicate_distance: Optional[int] = None, # Skip chunks whose SimHash is within this Hamming distance of a stored chunk (None to disable)
+        embedding_cache_dir: Optional[str] = None, # Directory of the on-disk embedding cache (None to disable)
+        index_type: Literal["flat", "hnsw", "ivf_flat", "ivf_pq"] = "flat", # FAISS index used once the store reaches ann_train_threshold chunks
+        ann_train_threshold: int = 10000, # Number of chunks at which a flat index is replaced by (and trained as) `index_type`
+        nprobe: int = 16, # Number of inverted lists visited per query (IVF indexes)
+        ef_search: int = 64, # Size of the candidate list explored per query (HNSW indexes)
+        max_chunks: Optional[int] = None, # Evict least recently retrieved chunks beyond this many chunks (None for no limit)
+        max_bytes: Optional[int] = None, # Evict least recently retrieved chunks beyond this many bytes of text + vectors (None for no limit)
+        max_age: Optional[float] = None, # Evict chunks added more than this many seconds ago (None for no limit)
+        quantization: Optional[Literal["sq8", "pq"]] = None, # Store vectors as int8 scalar-quantized or product-quantized codes once the store reaches ann_train_threshold chunks (None for float32)
+        reduced_dimension: Optional[int] = None, # Reduce embeddings to this many dimensions (None to keep all)
+        dimension_reduction: Literal["pca", "truncate"] = "pca", # PCA trained with the index at ann_train_threshold chunks, or truncation of Matryoshka embeddings from the first chunk on
+        rerank_factor: Optional[int] = None, # Re-score rerank_factor * k candidates exactly with full-precision vectors from the on-disk embedding cache (None to disable)
+        ingestion_workers: Optional[int] = 1, # Processes chunking large batches of documents (None for one per CPU, 1 to chunk in the calling thread)
+        micro_batching: bool = False, # Encode through the shared micro-batching front-end, merging concurrent encode calls from many threads
+        encoder_backend: EncoderBackend = "torch", # Run the embedding model with PyTorch, ONNX Runtime ("onnx") or ONNX Runtime with int8 weights ("onnx-int8")
     ):
-        self.encoder = SentenceTransformer(model_name)
+        # Encoder (shared across stores) and embedding cache are loaded on first use
+        self.model_name = model_name
+        self.embedding_cache_dir = embedding_cache_dir
+        self.micro_batching = micro_batching
+        self.encoder_backend = encoder_backend
+        self._encoder = None
+        self._embedding_cache = None
+        self._lazy_init_lock = threading.Lock()
         self.use_bm25 = use_bm25
         self.bm25_weight = bm25_weight
+        self.fusion = fusion
         self.max_chunk_size = max_chunk_size
         self.max_chunk_overlap = max_chunk_overlap
+        self.chunking = chunking
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_chunk_overlap_tokens = max_chunk_overlap_tokens
+        self._chunk_tokenizer = None
+        self.ingestion_workers = ingestion_workers
 
-        # Initialize FAISS index
+        # Initialize FAISS index (exact search until the store is large enough for approximate search to pay off)
         self.index = None
-        self.documents = [] # TODO: turn into set/dict?
-        self.metadata = [] # TODO: combine metadata with documents
+        self.index_mapped = False # Vectors memory-mapped from a saved store (read-only until copied into memory)
+        self.index_type = index_type
+        self.ann_train_threshold = ann_train_threshold
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+        # Compressed vector storage, with the embedding cache on disk as the full-precision copy for re-ranking
+        if rerank_factor and not embedding_cache_dir:
+            raise ValueError("Re-ranking reads full-precision vectors from the embedding cache, set embedding_cache_dir")
+        self.quantization = quantization
+        self.reduced_dimension = reduced_dimension
+        self.dimension_reduction = dimension_reduction
+        self.rerank_factor = rerank_factor
+
+        self.chunks = ChunkStore() # Texts, metadata, hashes and times by chunk id
+
+        # Content hash -> chunk id (position in chunks, id in the FAISS index) for O(1) duplicate detection
+        self.chunk_ids = ChunkIdIndex()
+        self.near_duplicate_distance = near_duplicate_distance
+        self.near_duplicates = SimHashIndex(max_distance=near_duplicate_distance) if near_duplicate_distance is not None else None
         
-        if use_bm25: self.bm25 = None
+        if use_bm25: self.bm25 = BM25Index()
+
+        # Eviction policy for long-running processes (chunks are removed from the FAISS index by id)
+        if index_type == "hnsw" and (max_chunks or max_bytes or max_age):
+            raise ValueError("HNSW indexes do not support removing chunks, use a flat or IVF index with eviction")
+        self.max_chunks = max_chunks
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.num_evicted = 0
+
+        # Namespace -> ids of the chunks visible in it, so many statements can share one store (and its embeddings)
+        self.namespaces: Dict[str, Set[int]] = {}
+
+        # Retrievals share the lock, adds/evictions/clears take it exclusively
+        self._lock = ReadWriteLock()
             
-    def add_documents(self, documents: List[str], metadata: List[Dict]):
+    @property
+    def encoder(self):
+        if self._encoder is None: 
+            if self.micro_batching:
+                self._encoder = get_batching_encoder(self.model_name, backend=self.encoder_backend, verbose=VERBOSE)
+            else:
+                self._encoder = get_encoder(self.model_name, backend=self.encoder_backend, verbose=VERBOSE)
+        return self._encoder
+
+    @encoder.setter
+    def encoder(self, encoder):
+        self._encoder = encoder
+
+    @property
+    def chunk_tokenizer(self):
+        """Private copy of the encoder's tokenizer for chunking, so changing its truncation never races with encode calls."""
+        if self._chunk_tokenizer is None:
+            with self._lazy_init_lock:
+                if self._chunk_tokenizer is None:
+                    tokenizer = copy.deepcopy(self.encoder.tokenizer)
+                    tokenizer.backend_tokenizer.no_truncation() # Set once, so concurrent calls only read the tokenizer
+                    tokenizer.backend_tokenizer.no_padding()
+                    if self.max_chunk_tokens is None:
+                        self.max_chunk_tokens = self.encoder.max_seq_length - tokenizer.num_special_tokens_to_add()
+                    self._chunk_tokenizer = tokenizer
+        return self._chunk_tokenizer
+
+    @property
+    def embedding_cache(self) -> Optional[EmbeddingCache]:
+        if self._embedding_cache is None and self.embedding_cache_dir:
+            with self._lazy_init_lock:
+                if self._embedding_cache is None:
+                    # Shared with every store of the process using the same directory and model (other processes append under a file lock).
+                    # Embeddings of other backends differ slightly (int8 most), so each backend gets its own cache file
+                    self._embedding_cache = get_embedding_cache(
+                        self.embedding_cache_dir, 
+                        model_name=self.model_name if self.encoder_backend == "torch" else f"{self.model_name}.{self.encoder_backend}", 
+                        dimension=self.encoder.get_sentence_embedding_dimension()
+                    )
+        return self._embedding_cache
+
+    def add_documents(self, documents: List[str], metadata: List[Dict], namespace: Optional[str] = None):
+        """
+        Chunk, embed and index documents
+        *** params ***
+        documents: document texts
+        metadata: metadata dict per document
+        namespace: partition the chunks are visible in (chunks already in the store are only tagged with it, not re-embedded);
+            None adds them to GLOBAL_NAMESPACE, the shared context visible from every namespace
+        """
         if len(documents) == 0: return
 
-        # Split documents into chunks in parallel
-        with ThreadPoolExecutor() as executor:
-            chunked_docs = list(
-                executor.map(
-                    chunk_text, 
-                    documents, 
-                    itertools.repeat(self.max_chunk_size), 
-                    itertools.repeat(self.max_chunk_overlap)
-                )
-            )
+        chunking_options = {"max_chunk_size": self.max_chunk_size, "max_chunk_overlap": self.max_chunk_overlap, "fingerprints": self.near_duplicates is not None}
+        if self.chunking == "tokens":
+            # Cut chunks at the encoder's max sequence length, tokenizing each group of documents in one batch
+            chunking_options.update(tokenizer=self.chunk_tokenizer, max_chunk_tokens=self.max_chunk_tokens, max_chunk_overlap_tokens=self.max_chunk_overlap_tokens)
+
+        # Chunk, hash and fingerprint documents (in worker processes for large batches, since the work is pure Python and holds the GIL)
+        # and encode the new chunks of each group as soon as it arrives, outside the lock, so slow encoding blocks neither readers
+        # nor other writers (embeddings of previously seen chunks are loaded from the cache)
+        chunks, token_counts, fingerprints = [], {}, {} # Token counts are kept with the chunks for prompt budgeting
+        embedding_rows, embedding_groups = {}, [] # Chunk hash -> (group, row) of its embedding
+
+        def encode_group(candidates: Dict[int, str]):
+            embeddings = self._encode(list(candidates.values()), list(candidates))
+            faiss.normalize_L2(embeddings) # In place, so that inner product is cosine similarity
+            embedding_rows.update((chunk_hash, (len(embedding_groups), row)) for row, chunk_hash in enumerate(candidates))
+            embedding_groups.append(self._truncate(embeddings))
+
+        for first_document, chunked_docs in iter_chunked_documents(documents, num_workers=self.ingestion_workers, **chunking_options):
+            group_chunks = []
+            for doc_chunks, meta in zip(chunked_docs, metadata[first_document:]):
+                for chunk, chunk_hash, num_tokens, fingerprint in doc_chunks:
+                    group_chunks.append((chunk, meta, chunk_hash))
+                    token_counts[chunk_hash] = num_tokens
+                    if fingerprint is not None: fingerprints[chunk_hash] = fingerprint
+            chunks.extend(group_chunks)
+
+            with self._lock.read():
+                candidates = {
+                    chunk_hash: chunk for chunk, _, chunk_hash in group_chunks
+                    if chunk_hash not in embedding_rows and not self._is_stored(chunk_hash, fingerprints)
+                }
+            if len(candidates) > 0: encode_group(candidates)
+
+        # Apply the batch atomically, deduplicating again against the current state since another writer may have added the same chunks meanwhile.
+        # Chunks whose stored (near-)duplicate was evicted since they were looked up are encoded outside the lock and the batch is retried
+        while True:
+            with self._lock.write():
+                missing = {
+                    chunk_hash: chunk for chunk, _, chunk_hash in chunks
+                    if chunk_hash not in embedding_rows and not self._is_stored(chunk_hash, fingerprints)
+                }
+                if len(missing) == 0:
+                    self._add_chunks(chunks, namespace, embedding_rows, embedding_groups, token_counts, fingerprints)
+                    return
+            encode_group(missing)
+
+    def _is_stored(self, chunk_hash: int, fingerprints: Dict[int, int]) -> bool:
+        """Whether the store holds a chunk (or a near-duplicate of it), so it is only tagged instead of embedded."""
+        if chunk_hash in self.chunk_ids: return True
+        return self.near_duplicates is not None and self.near_duplicates.find(fingerprints[chunk_hash]) is not None
+
+    def _add_chunks(
+        self,
+        chunks: List[Tuple[str, Dict, int]],
+        namespace: Optional[str],
+        embedding_rows: Dict[int, Tuple[int, int]],
+        embedding_groups: List[np.ndarray],
+        token_counts: Dict[int, int],
+        fingerprints: Dict[int, int]
+    ):
+        """Tag duplicates and add the new (chunk, metadata, hash) of a batch with their embeddings, holding the write lock."""
+        namespace_ids = self.namespaces.setdefault(namespace or GLOBAL_NAMESPACE, set())
+
+        # Make sure no duplicate (or near-duplicate) chunks are added, looking up only the new chunks' hashes;
+        # chunks already stored (or added earlier in the batch) are only tagged with the namespace
+        chunked_docs_deduped, metadata_deduped, hashes_deduped = [], [], []
+        new_chunk_ids = {}
+        for chunk, meta, chunk_hash in chunks:
+            if chunk_hash in self.chunk_ids or chunk_hash in new_chunk_ids:
+                namespace_ids.add(self.chunk_ids.get(chunk_hash, new_chunk_ids.get(chunk_hash)))
+                continue
+
+            chunk_id = len(self.chunks) + len(chunked_docs_deduped)
+            if self.near_duplicates is not None:
+                near_duplicate_id = self.near_duplicates.find(fingerprints[chunk_hash])
+                if near_duplicate_id is not None:
+                    namespace_ids.add(near_duplicate_id)
+                    continue
+                self.near_duplicates.add(fingerprints[chunk_hash], chunk_id)
+
+            new_chunk_ids[chunk_hash] = chunk_id
+            chunked_docs_deduped.append(chunk)
+            metadata_deduped.append(meta)
+            hashes_deduped.append(chunk_hash)
 
-        # Make sure no duplicate chunks are added, TODO: this is inefficient
-        documents_set = set(self.documents)
-        chunked_docs_deduped, metadata_deduped = [], []
-        for chunks, meta in zip(chunked_docs, metadata):
-            for chunk in chunks:
-                if chunk not in documents_set:
-                    chunked_docs_deduped.append(chunk)
-                    metadata_deduped.append(meta)
-            
         if len(chunked_docs_deduped) == 0:
             print(f"No non-duplicate chunks found. Skipping...")
             return
 
-        # # Flatten chunks and duplicate metadata
-        # all_chunks = []
-        # all_metadata = []
-        # for chunks, meta in zip(chunked_docs_deduped, metadata_deduped):
-        #     all_chunks.extend(chunks)
-        #     all_metadata.extend([meta] * len(chunks))
-
-        # Encode chunks
-        embeddings = self.encoder.encode(
-            chunked_docs_deduped,
-            convert_to_tensor=True,
+        # Initialize or update FAISS index, keyed by chunk id, one group at a time instead of concatenating the groups into a copy
+        # (FAISS reads contiguous float32 rows without converting them, and a group is only gathered into a new array
+        # if some of its candidates were dropped or reordered)
+        ids = np.arange(len(self.chunks), len(self.chunks) + len(hashes_deduped), dtype=np.int64)
+        group_rows, group_ids = [[] for _ in embedding_groups], [[] for _ in embedding_groups]
+        for chunk_id, chunk_hash in zip(ids.tolist(), hashes_deduped):
+            group, row = embedding_rows[chunk_hash]
+            group_rows[group].append(row)
+            group_ids[group].append(chunk_id)
+        for embeddings, rows, chunk_ids in zip(embedding_groups, group_rows, group_ids):
+            if len(rows) == 0: continue
+            if rows != list(range(len(embeddings))): embeddings = embeddings[rows]
+            if self.index is None:
+                self.index = build_index("flat", embeddings, np.array(chunk_ids, dtype=np.int64))
+            else:
+                self._unmap_index()
+                self.index.add_with_ids(embeddings, np.array(chunk_ids, dtype=np.int64))
+        self._maybe_build_ann_index()
+        self.chunks.extend(
+            chunked_docs_deduped, 
+            metadata_deduped, 
+            hashes_deduped, 
+            added_at=time.time(), 
+            num_tokens=[token_counts.get(chunk_hash, -1) for chunk_hash in hashes_deduped]
         )
+        self.chunk_ids.update(new_chunk_ids)
+        namespace_ids.update(ids.tolist())
         
-        # Initialize or update FAISS index
-        if self.index is None:
-            dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatIP(dimension)
-        
-        # Add embeddings to FAISS index
-        self.index.add(embeddings.cpu().numpy())
-        self.documents.extend(chunked_docs_deduped)
-        self.metadata.extend(metadata_deduped)
-        
-        # Initialize BM25 index
+        # Append new chunks to the BM25 index (incremental, no rebuild over the whole corpus)
         if self.use_bm25:
-            self.bm25 = BM25Okapi(self.documents)
+            self.bm25.add_documents(chunked_docs_deduped)
+
+        self._evict_if_needed()
+
+    def _evict_if_needed(self):
+        """Apply the eviction policy: drop chunks older than max_age, then least recently retrieved chunks until within max_chunks/max_bytes."""
+        if not (self.max_chunks or self.max_bytes or self.max_age): return
+
+        added_at, last_access = np.array(self.chunks.added_at), np.array(self.chunks.last_access)
+        resident = np.flatnonzero(~np.isnan(added_at))
+        to_evict = []
+        if self.max_age:
+            expired = time.time() - added_at[resident] > self.max_age
+            to_evict.extend(resident[expired].tolist())
+            resident = resident[~expired]
+
+        # Least recently used first
+        resident = resident[np.argsort(last_access[resident], kind="stable")]
+        num_over = len(resident) - self.max_chunks if self.max_chunks else 0
+        if self.max_bytes:
+            vector_bytes = code_size(self.index)
+            text_bytes = self.chunks.text_bytes - sum(self.chunks.text_size(i) for i in to_evict)
+            while num_over < len(resident) and text_bytes + (len(resident) - num_over) * vector_bytes > self.max_bytes:
+                text_bytes -= self.chunks.text_size(resident[num_over])
+                num_over += 1
+        to_evict.extend(resident[:max(num_over, 0)].tolist())
+
+        if len(to_evict) > 0: self._evict(to_evict)
+
+    def evict(self, chunk_ids: List[int]):
+        """
+        Remove chunks from the FAISS index, BM25 index, deduplication maps and storage
+        (the ids of the remaining chunks change when evicted rows are compacted away)
+        """
+        with self._lock.write():
+            self._evict(chunk_ids)
+
+    def _evict(self, chunk_ids: List[int]):
+        self._unmap_index()
+        self.index.remove_ids(np.asarray(chunk_ids, dtype=np.int64))
+        for chunk_id in chunk_ids:
+            text = self.chunks.text(chunk_id)
+            if self.use_bm25: self.bm25.remove_document(chunk_id, text)
+            if self.near_duplicates is not None: self.near_duplicates.remove(simhash(text), chunk_id)
+            del self.chunk_ids[self.chunks.content_hash(chunk_id)]
+            self.chunks.remove(chunk_id)
+        for namespace_ids in self.namespaces.values(): namespace_ids.difference_update(chunk_ids)
+        self.num_evicted += len(chunk_ids)
+
+        # Drop evicted rows once they outnumber resident chunks (or their text outweighs resident text), so per-chunk columns
+        # stay within ~2x of the resident chunks in long-running processes, at an amortized O(1) cost per eviction
+        num_resident = len(self.chunks) - self.chunks.num_removed
+        if self.chunks.num_removed > num_resident or self.chunks.wasted_bytes > self.chunks.text_bytes: self._compact()
+
+    def _compact(self):
+        """Drop evicted chunks' rows from storage and the BM25 index, renumbering the remaining chunk ids everywhere."""
+        num_ids = len(self.chunks)
+        kept = self.chunks.compact()
+        new_ids = np.full(num_ids, -1, dtype=np.int64)
+        new_ids[kept] = np.arange(len(kept))
+
+        if self.index is not None: remap_ids(self.index, new_ids)
+        if self.use_bm25: self.bm25.compact(kept)
+        if self.near_duplicates is not None: self.near_duplicates.remap(new_ids)
+        self.chunk_ids.remap(new_ids)
+        self.namespaces = {
+            namespace: set(new_ids[np.fromiter(ids, dtype=np.int64, count=len(ids))].tolist())
+            for namespace, ids in self.namespaces.items()
+        }
+
+    def drop_namespace(self, namespace: str):
+        """Forget a namespace. Its chunks stay in the store (and are reused if added again) until evicted or cleared."""
+        with self._lock.write():
+            self.namespaces.pop(namespace, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of resident/evicted chunks and their approximate memory footprint."""
+        with self._lock.read():
+            num_resident = self.index.ntotal if self.index is not None else 0
+            vector_bytes = num_resident * code_size(self.index) if self.index is not None else 0
+            return {
+                "resident_chunks": num_resident,
+                "evicted_chunks": self.num_evicted,
+                "text_bytes": self.chunks.text_bytes,
+                "vector_bytes": vector_bytes,
+                "total_bytes": self.chunks.text_bytes + vector_bytes,
+                "chunk_store_bytes": self.chunks.nbytes(),
+                "unique_metadata": len(self.chunks.metadata_table),
+                "namespaces": len(self.namespaces),
+            }
     
-    def retrieve(self, query: str, k: int = 10) -> List[Document]:
-        # Get FAISS scores
-        query_embedding = self.encoder.encode([query])[0].reshape(1, -1) # Reshape to 1D array
-        
-        # Error handling: if index is not initialized, raise an error
-        if self.index is None:
-            raise ValueError("Index is not initialized. Please add documents first.")
-        
-        faiss_scores, faiss_indices = self.index.search(query_embedding, k)
+    def _unmap_index(self):
+        """Copy memory-mapped vectors into memory before the index is modified, since FAISS maps them read-only."""
+        if not self.index_mapped: return
+        load_inverted_lists(self.index)
+        self.index_mapped = False
+
+    def _maybe_build_ann_index(self):
+        """Replace the flat index with a trained approximate and/or compressed index once the store crosses the training threshold."""
+        use_pca = self.reduced_dimension is not None and self.dimension_reduction == "pca"
+        if self.index_type == "flat" and not self.quantization and not use_pca: return
+        if not is_flat(self.index) or self.index.ntotal < self.ann_train_threshold: return
+        self.index = build_index(
+            self.index_type, 
+            *stored_vectors(self.index), 
+            quantization=self.quantization, 
+            pca_dimension=self.reduced_dimension if use_pca else None
+        )
+        set_search_parameters(self.index, nprobe=self.nprobe, ef_search=self.ef_search)
+
+    def _truncate(self, embeddings: np.ndarray) -> np.ndarray:
+        """Keep the first reduced_dimension dimensions of normalized (Matryoshka) embeddings and re-normalize them."""
+        if self.reduced_dimension is None or self.dimension_reduction != "truncate": return embeddings
+        embeddings = np.ascontiguousarray(embeddings[:, :self.reduced_dimension])
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def _rerank(self, query_embedding: np.ndarray, indices: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score candidates by exact inner product with their full-precision embeddings from the embedding cache, keeping the top k."""
+        embeddings, found = self.embedding_cache.get([self.chunks.content_hash(idx) for idx in indices])
+        exact_scores = scores.copy() # Candidates missing from the cache keep their approximate score
+        if len(embeddings) > 0:
+            faiss.normalize_L2(embeddings)
+            exact_scores[found] = embeddings @ query_embedding
+        order = np.argsort(-exact_scores, kind="stable")[:k]
+        return indices[order], exact_scores[order]
+
+    def _encode(self, chunks: List[str], chunk_hashes: List[int]) -> np.ndarray:
+        """Encode chunks into one contiguous float32 array, only sending embedding cache misses to the encoder."""
+        if self.embedding_cache is None:
+            return encode_float32(self.encoder, chunks, batch_size=ENCODE_BATCH_SIZE)
+
+        cached_embeddings, found = self.embedding_cache.get(chunk_hashes)
+        if not found.any(): # Nothing cached, encode straight into the result
+            embeddings = encode_float32(self.encoder, chunks, batch_size=ENCODE_BATCH_SIZE)
+            self.embedding_cache.put(chunk_hashes, embeddings)
+            return embeddings
+
+        embeddings = np.empty((len(chunks), self.embedding_cache.dimension), dtype=np.float32)
+        embeddings[found] = cached_embeddings
+        missing = np.flatnonzero(~found)
+        if len(missing) > 0:
+            new_embeddings = encode_float32(self.encoder, [chunks[i] for i in missing], batch_size=ENCODE_BATCH_SIZE)
+            embeddings[missing] = new_embeddings
+            self.embedding_cache.put([chunk_hashes[i] for i in missing], new_embeddings)
         
-        # Get relevant chunks based on FAISS scores (and combine w/ BM25 scores if enabled)
-        results = []
-        for i, idx in enumerate(faiss_indices[0]):
-            score = float(faiss_scores[0][i])
+        return embeddings
+
+    def retrieve(self, query: str, k: int = 10, namespace: Optional[str] = None, include_global: bool = True) -> List[Document]:
+        return self.retrieve_many([query], k=k, namespace=namespace, include_global=include_global)[0]
+
+    def retrieve_many(self, queries: List[str], k: int = 10, namespace: Optional[str] = None, include_global: bool = True) -> List[List[Document]]:
+        """
+        Retrieve the top-k documents for each query, encoding, searching and BM25-scoring all queries as one batch
+        *** params ***
+        queries: search queries
+        k: number of documents per query
+        namespace: only retrieve chunks in this namespace (None to search the whole store)
+        include_global: also retrieve chunks in GLOBAL_NAMESPACE when filtering by namespace
+
+        *** returns ***
+        List of documents per query, sorted by score
+        """
+        if len(queries) == 0: return []
+
+        # Encode queries outside the lock, so encoding overlaps with other retrievals and adds
+        query_embeddings = np.asarray(self.encoder.encode(queries), dtype=np.float32) # One row per query
+        faiss.normalize_L2(query_embeddings)
+
+        # Search under the read lock (any number of retrievals run in parallel, adds and evictions wait)
+        with self._lock.read():
+            # Error handling: if index is not initialized, raise an error
+            if self.index is None:
+                raise ValueError("Index is not initialized. Please add documents first.")
+
+            # Restrict the search to the chunks of the namespace
+            search_parameters = None
+            if namespace is not None:
+                allowed_ids = self.namespaces.get(namespace, set())
+                if include_global and namespace != GLOBAL_NAMESPACE: allowed_ids = allowed_ids | self.namespaces.get(GLOBAL_NAMESPACE, set())
+                allowed_ids = np.fromiter(allowed_ids, dtype=np.int64, count=len(allowed_ids))
+                search_parameters = filtered_search_parameters(self.index, allowed_ids, nprobe=self.nprobe, ef_search=self.ef_search)
+
+            # Get FAISS scores for all queries in one matrix search
+            faiss_scores, faiss_indices = self.index.search(
+                self._truncate(query_embeddings), 
+                k * self.rerank_factor if self.rerank_factor else k, 
+                params=search_parameters
+            )
+            sparse_scores = self.bm25.get_batch_scores(queries) if self.use_bm25 else None
+            if self.use_bm25 and namespace is not None:
+                # Zero out BM25 scores outside the namespace so they do not affect normalization/ranks in fusion
+                outside = np.ones(sparse_scores.shape[1], dtype=bool)
+                outside[allowed_ids] = False
+                sparse_scores[:, outside] = 0
+
+            results, now = [], time.time()
+            for i in range(len(queries)):
+                # FAISS pads with -1 if there are fewer than k documents
+                found = faiss_indices[i] >= 0
+                indices, scores = faiss_indices[i][found], faiss_scores[i][found]
+                if self.rerank_factor:
+                    indices, scores = self._rerank(query_embeddings[i], indices, scores, k)
             
-            # Combine FAISS and BM25 scores using weighted average
-            if self.use_bm25:
-                bm25_score = self.bm25.get_scores([query])[idx]
-                score = (
-                    self.bm25_weight * bm25_score + 
-                    (1 - self.bm25_weight) * score
-                )
+                # Combine FAISS and BM25 scores
+                if self.use_bm25:
+                    scores = self._fuse_scores(scores, sparse_scores[i], indices)
 
-            # Save retrieved document w/ weighted score
-            if score > 0: # TODO: make this threshold configurable
-                results.append(
+                # Record retrieval time for LRU eviction (concurrent readers may race here, any of their timestamps will do)
+                for idx in indices: self.chunks.last_access[idx] = now
+
+                # Save retrieved documents w/ combined score
+                query_results = [
                     Document(
-                        content=self.documents[idx],
-                        metadata=self.metadata[idx],
-                        score=score
+                        content=self.chunks.text(idx),
+                        metadata=self.chunks.metadata(idx),
+                        score=float(score),
+                        chunk_id=int(idx),
+                        num_tokens=self.chunks.token_count(idx),
+                        content_hash=self.chunks.content_hash(idx)
                     )
-                )
+                    for idx, score in zip(indices, scores)
+                    if self.fusion != "weighted" or score > 0 # Raw score threshold, TODO: make this threshold configurable
+                ]
         
-        # Sort results by score in descending order
-        return sorted(results, key=lambda x: x.score, reverse=True)
+                # Sort results by score in descending order
+                results.append(sorted(query_results, key=lambda x: x.score, reverse=True))
+
+            return results
+
+    def _fuse_scores(self, dense_scores: np.ndarray, sparse_scores: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """
+        Fuse dense scores of the FAISS candidates with BM25 scores in one vectorized step
+        *** params ***
+        dense_scores: inner product scores of the candidates (in FAISS rank order)
+        sparse_scores: BM25 scores of every document in the corpus
+        indices: document indices of the candidates
+
+        *** returns ***
+        Fused score for each candidate
+        """
+        if len(indices) == 0: return dense_scores
+
+        if self.fusion == "weighted":
+            # Weighted average of raw scores
+            return self.bm25_weight * sparse_scores[indices] + (1 - self.bm25_weight) * dense_scores
+        elif self.fusion == "minmax":
+            # Weighted average of scores min-max normalized to [0, 1] (dense over the candidates, BM25 over the corpus)
+            def _min_max(x): return (x - x.min()) / (x.max() - x.min()) if x.max() > x.min() else np.ones_like(x)
+            return self.bm25_weight * _min_max(sparse_scores)[indices] + (1 - self.bm25_weight) * _min_max(dense_scores)
+        elif self.fusion == "rrf":
+            # Weighted reciprocal rank fusion (dense rank among the candidates, BM25 rank over the corpus)
+            dense_ranks = np.arange(len(indices))
+            sparse_ranks = (sparse_scores[None, :] > sparse_scores[indices][:, None]).sum(axis=1)
+            return (
+                self.bm25_weight / (RRF_K + sparse_ranks + 1) + 
+                (1 - self.bm25_weight) / (RRF_K + dense_ranks + 1)
+            )
+        else:
+            raise ValueError(f"Unsupported fusion mode: {self.fusion}")
     
     def clear(self):
         """Clear the vector store."""
-        self.index = None
-        self.documents = []
-        self.metadata = []
+        with self._lock.write():
+            self.index = None
+            self.index_mapped = False
+            self.chunks = ChunkStore()
+            self.chunk_ids = ChunkIdIndex()
+            self.num_evicted = 0
+            self.namespaces = {}
+            if self.near_duplicates is not None: self.near_duplicates.clear()
+            if self.use_bm25: self.bm25.clear()
+
+    def save(self, path: str):
+        """
+        Save the store to a directory: FAISS index, chunk columns (texts as an offset-indexed UTF-8 blob,
+        metadata as an interned table plus id column, hashes, times), the hash -> chunk id index, namespaces,
+        and the BM25 postings and SimHash fingerprints as columns that `load` memory-maps.
+        Flat and scalar-quantized indexes are saved as a single-list IVF (still an exhaustive scan), the only layout FAISS memory-maps.
+        """
+        os.makedirs(path, exist_ok=True)
+        if self.index_mapped:
+            # FAISS would write a mapped index as a reference to the file it was loaded from, so copy its vectors in first
+            with self._lock.write(): self._unmap_index()
+
+        # Writes a consistent snapshot, retrievals can continue meanwhile
+        with self._lock.read():
+            with open(os.path.join(path, "config.json.tmp"), "w") as f:
+                json.dump({
+                    "model_name": self.model_name,
+                    "max_chunk_size": self.max_chunk_size,
+                    "max_chunk_overlap": self.max_chunk_overlap,
+                    "chunking": self.chunking,
+                    "max_chunk_tokens": self.max_chunk_tokens,
+                    "max_chunk_overlap_tokens": self.max_chunk_overlap_tokens,
+                    "ingestion_workers": self.ingestion_workers,
+                    "use_bm25": self.use_bm25,
+                    "bm25_weight": self.bm25_weight,
+                    "fusion": self.fusion,
+                    "near_duplicate_distance": self.near_duplicate_distance,
+                    "embedding_cache_dir": self.embedding_cache_dir,
+                    "index_type": self.index_type,
+                    "ann_train_threshold": self.ann_train_threshold,
+                    "nprobe": self.nprobe,
+                    "ef_search": self.ef_search,
+                    "max_chunks": self.max_chunks,
+                    "max_bytes": self.max_bytes,
+                    "max_age": self.max_age,
+                    "quantization": self.quantization,
+                    "reduced_dimension": self.reduced_dimension,
+                    "dimension_reduction": self.dimension_reduction,
+                    "rerank_factor": self.rerank_factor,
+                    "micro_batching": self.micro_batching,
+                    "encoder_backend": self.encoder_backend,
+                }, f, indent=2)
+
+            if self.index is not None:
+                faiss.write_index(mappable_index(self.index), os.path.join(path, "index.faiss.tmp"))
+            self.chunks.save(path)
+            with open(os.path.join(path, "namespaces.json.tmp"), "w") as f:
+                json.dump({namespace: sorted(ids) for namespace, ids in self.namespaces.items()}, f)
+            self.chunk_ids.save(path)
+            if self.use_bm25: self.bm25.save(path)
+            if self.near_duplicates is not None: self.near_duplicates.save(path)
+
+            # Replace atomically (like the chunk columns), so a crash mid-save never leaves a half-written file behind
+            if self.index is not None:
+                os.replace(os.path.join(path, "index.faiss.tmp"), os.path.join(path, "index.faiss"))
+            elif os.path.exists(os.path.join(path, "index.faiss")): # Left over from an earlier save of a non-empty store
+                os.remove(os.path.join(path, "index.faiss"))
+            for name in ("namespaces.json", "config.json"):
+                os.replace(os.path.join(path, name + ".tmp"), os.path.join(path, name))
+            if os.path.exists(os.path.join(path, "sparse.pkl")): # Pickled indexes of stores saved by earlier versions
+                os.remove(os.path.join(path, "sparse.pkl"))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, **kwargs) -> "VectorStore":
+        """
+        Load a store saved with `save`
+        *** params ***
+        path: directory the store was saved to
+        mmap: memory-map the FAISS index, chunk texts, metadata ids, hash -> chunk id index, BM25 postings and SimHash fingerprints
+            instead of reading them into memory, so opening is near-instant and the pages are shared across processes through the page cache
+            (the first add or eviction copies the index's vectors into memory, since FAISS maps them read-only)
+        kwargs: constructor arguments overriding the saved configuration (e.g. embedding_cache_dir)
+
+        *** returns ***
+        VectorStore
+        """
+        with open(os.path.join(path, "config.json")) as f:
+            store = cls(**{**json.load(f), **kwargs})
+
+        index_path = os.path.join(path, "index.faiss")
+        if os.path.exists(index_path):
+            store.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP if mmap else 0)
+            store.index_mapped = mmap
+            set_search_parameters(store.index, nprobe=store.nprobe, ef_search=store.ef_search)
+        store.chunks = ChunkStore.load(path, mmap=mmap)
+        store.chunk_ids = ChunkIdIndex.load(path, mmap=mmap) or ChunkIdIndex.from_chunks(store.chunks)
+        store.num_evicted = store.chunks.num_removed
+        with open(os.path.join(path, "namespaces.json")) as f:
+            store.namespaces = {namespace: set(ids) for namespace, ids in json.load(f).items()}
+
+        # Indexes missing from the directory (saved with them disabled, or pickled by earlier versions) are rebuilt from the chunk texts
+        if store.use_bm25:
+            store.bm25 = BM25Index.load(path, mmap=mmap)
+            if store.bm25 is None:
+                store.bm25 = BM25Index()
+                store.bm25.add_documents([chunk.content or "" for chunk in store.chunks])
+                for chunk_id in range(len(store.chunks)):
+                    if not store.chunks.is_resident(chunk_id): store.bm25.remove_document(chunk_id, "")
+        if store.near_duplicates is not None:
+            store.near_duplicates = SimHashIndex.load(path, max_distance=store.near_duplicate_distance, mmap=mmap)
+            if store.near_duplicates is None:
+                store.near_duplicates = SimHashIndex(max_distance=store.near_duplicate_distance)
+                for chunk_id in store.chunks.resident_ids().tolist(): store.near_duplicates.add(simhash(store.chunks.text(chunk_id)), chunk_id)
+        return store
 
 class ClaimExtractorSignature(dspy.Signature):
     """Extract specific claims from the given statement.
@@ -608,6 +1226,40 @@ class OverallStatementEvaluator(dspy.Module):
                 
         return result.overall_verdict, result.confidence, result.reasoning
 
+def fuse_rankings(rankings: List[List[Document]], k: int, mode: Literal["rrf", "max"] = "rrf") -> Tuple[List[Document], Dict[str, int]]:
+    """
+    Merge per-query rankings by content hash and keep the global top-k
+    (chunk ids are renumbered by compaction, so rankings retrieved before and after one can give different chunks the same id)
+    *** params ***
+    rankings: retrieved documents for each query, best first
+    k: number of documents to keep after merging
+    mode: "rrf" sums reciprocal ranks across queries, "max" keeps each chunk's best score
+
+    *** returns ***
+    Merged documents (best first) and counts of the duplicate chunks/tokens removed
+    """
+    fused_scores, best_docs = {}, {}
+    duplicate_chunks, duplicate_tokens = 0, 0
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.content_hash if doc.content_hash is not None else content_hash(doc.content)
+            score = 1 / (RRF_K + rank + 1) if mode == "rrf" else doc.score
+            if key in best_docs:
+                duplicate_chunks += 1
+                duplicate_tokens += doc.num_tokens if doc.num_tokens is not None else len(doc.content.split()) # Whitespace tokens approximate the count if not chunked by tokens
+                fused_scores[key] = fused_scores[key] + score if mode == "rrf" else max(fused_scores[key], score)
+            else:
+                fused_scores[key] = score
+                best_docs[key] = doc
+
+    top_keys = sorted(fused_scores, key=fused_scores.get, reverse=True)[:k]
+    fused_docs = [replace(best_docs[key], score=float(fused_scores[key])) for key in top_keys]
+    return fused_docs, {
+        "duplicate_chunks": duplicate_chunks,
+        "duplicate_tokens": duplicate_tokens,
+        "truncated_chunks": len(fused_scores) - len(top_keys), # Unique chunks dropped by the top-k cap
+    }
+
 class FactCheckPipeline:
     def __init__(
         self,
@@ -616,23 +1268,60 @@ class FactCheckPipeline:
         retriever_k: int = 10,
         search_provider: SearchProvider = None,
         context: List[Document] = None,
+        context_store_path: Optional[str] = None, # Directory of a VectorStore saved with VectorStore.save to load (memory-mapped) as the initial knowledge base
         self_correct_per_claim: bool = False, # Pipeline will self-correct if it detects that the claim is unverifiable
         self_correct_per_answer: bool = False, # Pipeline will self-correct if it detects that the answer doesn't have enough info
         num_retries_per_answer: int = 3,
         num_retries_per_claim: int = 3,
+        concurrent_search: bool = True, # Issue all search queries of a statement concurrently instead of one after another
+        batch_retrieval: bool = True, # Retrieve documents for all search queries of a component in one batch
+        fused_k: int = None, # Max number of documents per component after merging the rankings of its search queries (defaults to retriever_k)
+        full_page: bool = False, # Also fetch the result pages and index their full text, not only the search excerpts
     ):
         self.search_provider = search_provider
         self.model_name = model_name
         self.retriever_k = retriever_k
+        self.concurrent_search = concurrent_search
+        self.batch_retrieval = batch_retrieval
+        self.fused_k = fused_k or retriever_k
+        self.fetcher = PageFetcher(
+            timeout=SCRAPE_TIMEOUT,
+            max_connections=MAX_CONCURRENT_FETCHES,
+            max_per_host=MAX_FETCHES_PER_HOST,
+            max_bytes=MAX_PAGE_BYTES
+        ) if full_page else None
         
         # Initialize components
         self.claim_extractor = ClaimExtractor()
         self.question_generator = QuestionGenerator()
-        self.retriever = VectorStore(
-            model_name=embedding_model,
-            use_bm25=USE_BM25,
-            bm25_weight=BM25_WEIGHT
-        )
+        if context_store_path:
+            # Memory-map a previously saved store (e.g. a large reference corpus) instead of re-chunking and re-embedding it
+            self.retriever = VectorStore.load(context_store_path, mmap=True, embedding_cache_dir=EMBEDDING_CACHE_DIR)
+            if self.retriever.model_name != embedding_model:
+                # Queries must be embedded by the model the stored chunks were embedded with
+                raise ValueError(f"Store at {context_store_path} was embedded with {self.retriever.model_name}, not {embedding_model}")
+        else:
+            self.retriever = VectorStore(
+                model_name=embedding_model,
+                chunking=CHUNKING,
+                use_bm25=USE_BM25,
+                bm25_weight=BM25_WEIGHT,
+                fusion=FUSION_MODE,
+                near_duplicate_distance=NEAR_DUPLICATE_DISTANCE,
+                embedding_cache_dir=EMBEDDING_CACHE_DIR,
+                index_type=INDEX_TYPE,
+                ann_train_threshold=ANN_TRAIN_THRESHOLD,
+                max_chunks=MAX_STORE_CHUNKS,
+                max_bytes=MAX_STORE_BYTES,
+                max_age=MAX_CHUNK_AGE,
+                quantization=QUANTIZATION,
+                reduced_dimension=REDUCED_DIMENSION,
+                dimension_reduction=DIMENSION_REDUCTION,
+                rerank_factor=RERANK_FACTOR,
+                ingestion_workers=INGESTION_WORKERS,
+                micro_batching=MICRO_BATCH_ENCODING,
+                encoder_backend=ENCODER_BACKEND
+            )
         self.answer_synthesizer = AnswerSynthesizer()
         self.claim_evaluator = ClaimEvaluator()
         self.overall_statement_evaluator = OverallStatementEvaluator()
@@ -651,10 +1340,44 @@ class FactCheckPipeline:
                 [doc.metadata for doc in context]
             )
 
+        # Search statistics (executed/coalesced searches, cache hits/misses) of the last fact check
+        self.last_search_stats = {}
+
+        # Page fetch statistics (fetched/failed/truncated pages, bytes read) of the last fact check in full-page mode
+        self.last_fetch_stats = {}
+
+        # Duplicate chunks/tokens removed when merging retrieval results, per component of the last fact check
+        self.last_fusion_stats = []
+
         # Chat history for interactive mode, TODO: implement history
         self.chat_history = []
 
-    def fact_check(self, statement: str, web_search: bool = True):
+    def _search_concurrently(self, queries: List[str], search_results_by_query: Dict[str, List[SearchResult]]):
+        """Run web searches for all queries not yet in `search_results_by_query` concurrently and store the results there."""
+        queries = [query for query in dict.fromkeys(queries) if query not in search_results_by_query]
+        if len(queries) == 0: return
+
+        if VERBOSE: print_header(f"Searching the web for {len(queries)} queries concurrently", level=2)
+        search_results_by_query.update(self.search_provider.search_many(queries, NUM_SEARCH_RESULTS))
+
+    def _ingest_pages(self, search_results: List[SearchResult], namespace: Optional[str], ingested_urls: Set[str]):
+        """Fetch the full pages of search results not in `ingested_urls` concurrently and add each page to the retriever as soon as it arrives."""
+        results_by_url = {result.url: result for result in search_results if result.url and result.url not in ingested_urls}
+        if len(results_by_url) == 0: return
+        ingested_urls.update(results_by_url)
+
+        if VERBOSE: print_header(f"Fetching {len(results_by_url)} pages", level=4)
+        for url, text in self.fetcher.fetch_many(list(results_by_url)):
+            # Embedding this page overlaps with the download of the remaining ones
+            result = results_by_url[url]
+            self.retriever.add_documents([text], [{"title": result.title, "url": result.url, "source": result.source}], namespace=namespace)
+
+    def fact_check(
+        self,
+        statement: str,
+        web_search: bool = True,
+        namespace: Optional[str] = None, # Retriever namespace for this statement's sources, so statements sharing the store do not see each other's evidence (None to use the whole store)
+    ):
         if VERBOSE:
             print_header("Starting Fact Check Pipeline", level=0, decorator='=')
             print_header(f"Original Statement: {colored(statement, 'white')}", level=0)
@@ -686,10 +1409,40 @@ class FactCheckPipeline:
         #             print("\nProcess interrupted. Exiting...")
         #             exit(0)
 
+        self.last_fusion_stats = []
+        fusion_stats_by_component = {} # Stats of the last retrieval attempt per (claim, component)
+
+        # Snapshot search counters to report per-run search statistics
+        search_stats_before = self.search_provider.stats() if self.search_provider else {}
+        fetch_stats_before = self.fetcher.stats() if self.fetcher else {}
+
+        # URLs whose full page was already fetched for this statement (full-page mode)
+        ingested_urls = set()
+
+        # Search results for the statement, keyed by query (filled concurrently up front in concurrent search mode)
+        search_results_by_query = {}
+
+        # In concurrent search mode, decompose all claims up front so every search query of the statement can be issued at once
+        if self.concurrent_search:
+            if VERBOSE: print_header(f"Question Generation [{len(claims)} claims]", level=2, decorator='=')
+            with ThreadPoolExecutor(max_workers=len(claims)) as executor:
+                claim_components = list(executor.map(lambda c: retry_function(self.question_generator, statement, c), claims))
+            if web_search:
+                self._search_concurrently(
+                    [query for components in claim_components for component in components for query in component.search_queries],
+                    search_results_by_query
+                )
+                if self.fetcher:
+                    # Start on every result page of the statement at once, instead of a query's worth at a time
+                    self._ingest_pages([result for results in search_results_by_query.values() for result in results], namespace, ingested_urls)
+
         for claim_i, claim in enumerate(claims, 1):
             # Step 2: Decompose claim into components (questions and search queries)
-            if VERBOSE: print_header(f"Question Generation [{claim_i}/{len(claims)}]", level=2, decorator='=')
-            components = retry_function(self.question_generator, statement, claim) # List of ClaimComponent objects
+            if self.concurrent_search:
+                components = claim_components[claim_i - 1]
+            else:
+                if VERBOSE: print_header(f"Question Generation [{claim_i}/{len(claims)}]", level=2, decorator='=')
+                components = retry_function(self.question_generator, statement, claim) # List of ClaimComponent objects
 
             # Initialize claim verification flag and retries
             claim_verified = False
@@ -725,7 +1478,11 @@ class FactCheckPipeline:
                             print_header(f"Search Queries: {colored(component.search_queries, 'yellow')}", level=4)
 
                         # Step 3: Search and retrieve
-                        relevant_docs = []
+                        rankings = [] # Retrieved documents per search query
+                        if web_search and self.concurrent_search:
+                            # Fan out any queries not searched yet (e.g. refined queries) before ingesting results
+                            self._search_concurrently(component.search_queries, search_results_by_query)
+
                         for query_i, query in enumerate(component.search_queries, 1): 
                             if VERBOSE: 
                                 print_header(f"Web Search for Query [{query_i}/{len(component.search_queries)}]", level=4, decorator='=')
@@ -733,8 +1490,11 @@ class FactCheckPipeline:
 
                             # If web search is enabled, perform web search
                             if web_search:
-                                # Perform web search
-                                search_results = retry_function(self.search_provider.search, query, NUM_SEARCH_RESULTS)
+                                # Perform web search (or reuse results fetched concurrently)
+                                if query in search_results_by_query:
+                                    search_results = search_results_by_query[query]
+                                else:
+                                    search_results = retry_function(self.search_provider.search, query, NUM_SEARCH_RESULTS)
 
                                 if VERBOSE:
                                     print_header(f"Retrieved {len(search_results)} sources from the web:", level=4)
@@ -753,7 +1513,10 @@ class FactCheckPipeline:
                                             "url": result.url,
                                             "source": result.source
                                         })
-                                self.retriever.add_documents(documents, metadata)
+                                self.retriever.add_documents(documents, metadata, namespace=namespace)
+
+                                # Index the full text of result pages not fetched yet
+                                if self.fetcher: self._ingest_pages(search_results, namespace, ingested_urls)
 
                                 # TODO: Allow user to provide feedback on retrieved documents
                                 # if INTERACTIVE:
@@ -770,7 +1533,18 @@ class FactCheckPipeline:
                                 #         web_search_approved = True
 
                             # Get ONLY **relevant** documents (search results)
-                            relevant_docs.extend(self.retriever.retrieve(query, k=self.retriever_k))
+                            if not self.batch_retrieval:
+                                rankings.append(self.retriever.retrieve(query, k=self.retriever_k, namespace=namespace))
+
+                        # Retrieve for all queries of the component in one batch, after all search results are ingested
+                        if self.batch_retrieval:
+                            rankings = self.retriever.retrieve_many(component.search_queries, k=self.retriever_k, namespace=namespace)
+
+                        # Merge per-query rankings so chunks retrieved by several queries are only passed to the LM once
+                        relevant_docs, fusion_stats = fuse_rankings(rankings, k=self.fused_k, mode=RESULT_FUSION)
+                        fusion_stats_by_component[claim_i, component_i] = fusion_stats # A retry replaces the stats of the attempt it discards
+                        self.last_fusion_stats = list(fusion_stats_by_component.values())
+                        if VERBOSE: print_header(f"Removed {fusion_stats['duplicate_chunks']} duplicate chunks (~{fusion_stats['duplicate_tokens']} tokens) across search queries", level=4)
                         
                         if VERBOSE: 
                             print_header(f"Retrieved {len(relevant_docs)} documents from internal knowledge base:", level=4, decorator='=')
@@ -929,6 +1703,16 @@ class FactCheckPipeline:
                             print_header(f"[{k}] {colored(doc.content[:150], 'magenta')}...", level=4)
                             print_header(f"Source: {colored(doc.metadata['title'], 'yellow')} ({colored(doc.metadata['url'], 'cyan')})", level=4)
 
+        # Report how many searches were executed vs. coalesced with identical queries during this run
+        if self.search_provider:
+            search_stats = self.search_provider.stats()
+            self.last_search_stats = {name: value - search_stats_before.get(name, 0) for name, value in search_stats.items() if name in ("searches", "coalesced", "cache_hits", "cache_misses")}
+            if VERBOSE: print_header(f"Search Stats: {self.last_search_stats}", level=0)
+        if self.fetcher:
+            fetch_stats = self.fetcher.stats()
+            self.last_fetch_stats = {name: fetch_stats[name] - fetch_stats_before.get(name, 0) for name in ("fetched", "failed", "truncated", "bytes")}
+            if VERBOSE: print_header(f"Fetch Stats: {self.last_fetch_stats}", level=0)
+
         if VERBOSE:
             # Print final result
             print("\nFinal Fact-Check Result:")
@@ -946,11 +1730,39 @@ INTERACTIVE = False # Allow the user to provide feedback
 # Constants for Search Provider
 NUM_SEARCH_RESULTS = 10 # Number of search results to retrieve
 SCRAPE_TIMEOUT = 5 # Timeout for scraping a webpage (in seconds)
+FULL_PAGE_EVIDENCE = False # Fetch result pages and index their full text in addition to the search excerpts
+MAX_CONCURRENT_FETCHES = 32 # Maximum number of simultaneous page fetches
+MAX_FETCHES_PER_HOST = 2 # Maximum number of simultaneous page fetches per host
+MAX_PAGE_BYTES = 2 * 2**20 # Maximum bytes read per page (longer pages are truncated)
+SEARCH_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "search_cache.sqlite") # On-disk search result cache
+SEARCH_CACHE_TTL = 7 * 24 * 3600 # Time-to-live for cached search results (in seconds)
+SEARCH_CACHE_MAX_ENTRIES = 10000 # Maximum number of cached queries before LRU eviction
+MAX_CONCURRENT_SEARCHES = {"serper": 8, "duckduckgo": 2} # Maximum number of simultaneous requests per search provider
 
 # Constants for Retrieval (Vector DB + BM25)
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNKING = "characters" # Size context store chunks in "characters", or opt in to "tokens" of the embedding model (up to its max sequence length, so nothing is truncated)
+ENCODER_BACKEND = "torch" # Inference backend of the embedding model: "torch", "onnx" or "onnx-int8" (ONNX Runtime on CPU, needs optimum[onnxruntime])
+EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "embeddings") # On-disk embedding cache (None to disable)
 USE_BM25 = True # Use BM25 for retrieval (in addition to cosine similarity)
 BM25_WEIGHT = 0.5 # Weight for BM25 in the hybrid retrieval
+FUSION_MODE = "minmax" # How BM25 and dense scores are fused ("weighted" raw scores, "minmax" normalized scores, or "rrf" reciprocal rank fusion)
+RRF_K = 60 # Rank offset for reciprocal rank fusion
+INDEX_TYPE = "flat" # FAISS index for large stores ("flat", "hnsw", "ivf_flat", or "ivf_pq")
+ANN_TRAIN_THRESHOLD = 10000 # Number of chunks at which the flat index is swapped for INDEX_TYPE
+RESULT_FUSION = "rrf" # How rankings of a component's search queries are merged before answer synthesis ("rrf" or "max" score)
+MAX_STORE_CHUNKS = None # Max resident chunks in the context store before least recently retrieved ones are evicted (None for no limit)
+MAX_STORE_BYTES = None # Max bytes of chunk text + vectors in the context store (None for no limit)
+MAX_CHUNK_AGE = None # Seconds after which chunks are evicted from the context store (None for no limit)
+QUANTIZATION = None # Vector codes of the context store once it reaches ANN_TRAIN_THRESHOLD chunks: "sq8" (4x smaller), "pq" (32x smaller) or None (float32)
+REDUCED_DIMENSION = None # Embedding dimensions kept in the context store (None to keep all)
+DIMENSION_REDUCTION = "pca" # How embeddings are reduced to REDUCED_DIMENSION: "pca" or "truncate" (Matryoshka models only)
+INGESTION_WORKERS = 1 # Processes chunking large batches of scraped pages (1 to chunk in the calling thread, None for one per CPU)
+ENCODE_BATCH_SIZE = 32 # Chunks per encoder call when embedding documents
+MICRO_BATCH_ENCODING = False # Merge encode calls of concurrently running fact checks into shared micro-batches
+RERANK_FACTOR = None # Re-score RERANK_FACTOR * k candidates with full-precision vectors from the embedding cache (None to disable)
+GLOBAL_NAMESPACE = "global" # Retriever namespace of shared context (e.g. documents passed to the pipeline), visible from every statement's namespace
+NEAR_DUPLICATE_DISTANCE = None # Max SimHash Hamming distance for two chunks to count as near-duplicates (None to only drop exact duplicates, 6 keeps unrelated pilot chunks apart, see benchmark/bench_near_duplicates.py)
 
 # Example usage
 if __name__ == "__main__":
@@ -994,6 +1806,7 @@ if __name__ == "__main__":
         retriever_k=5,
         self_correct_per_claim=True,
         self_correct_per_answer=True,
+        full_page=FULL_PAGE_EVIDENCE,
         # num_retries_per_answer=3,
         # num_retries_per_claim=3,
     )
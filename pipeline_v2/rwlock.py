@@ -0,0 +1,42 @@
+import threading
+from contextlib import contextmanager
+
+class ReadWriteLock:
+    """
+    Lock allowing many concurrent readers or one writer.
+    Writer-preferring: new readers wait while a writer is waiting, so a steady stream of reads cannot starve writes.
+    Not reentrant (a thread holding the lock must not acquire it again).
+    """
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._num_readers = 0
+        self._num_writers_waiting = 0
+        self._writing = False
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writing or self._num_writers_waiting > 0:
+                self._condition.wait()
+            self._num_readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._num_readers -= 1
+                if self._num_readers == 0: self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._num_writers_waiting += 1
+            while self._writing or self._num_readers > 0:
+                self._condition.wait()
+            self._num_writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
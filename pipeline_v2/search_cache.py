@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from utils import normalize_query
+
+class SearchCache:
+    """
+    On-disk cache of raw search results, stored in SQLite and keyed by (provider, normalized query, num_results).
+    Entries expire after `ttl` seconds and the least recently used entries are evicted once `max_entries` is exceeded.
+    """
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # Hit/miss counters (reset with `reset_stats`)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Single connection shared across threads, serialized with a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_results (
+                    provider TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    num_results INTEGER NOT NULL,
+                    results TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (provider, query, num_results)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed_at ON search_results (accessed_at)")
+
+    def get(self, provider: str, query: str, num_results: int) -> Optional[List[Dict]]:
+        """Return the cached results for the query, or None if missing or expired."""
+        key = (provider, normalize_query(query), num_results)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT results, created_at FROM search_results WHERE provider = ? AND query = ? AND num_results = ?",
+                key
+            ).fetchone()
+
+            # Expired entries count as misses and are dropped right away
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM search_results WHERE provider = ? AND query = ? AND num_results = ?", key)
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            # Refresh access time for LRU eviction
+            self._conn.execute(
+                "UPDATE search_results SET accessed_at = ? WHERE provider = ? AND query = ? AND num_results = ?",
+                (now, *key)
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, provider: str, query: str, num_results: int, results: List[Dict]):
+        """Store the results for the query and evict the least recently used entries if over capacity."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, normalize_query(query), num_results, json.dumps(results), now, now)
+            )
+            num_entries = self._conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+            if num_entries > self.max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM search_results WHERE rowid IN (SELECT rowid FROM search_results ORDER BY accessed_at ASC LIMIT ?)",
+                    (num_entries - self.max_entries,)
+                )
+                self.evictions += cursor.rowcount
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the number of cached entries."""
+        with self._lock:
+            num_entries = self._conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": num_entries,
+        }
+
+    def reset_stats(self):
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def clear(self):
+        """Remove all cached entries."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM search_results")
@@ -0,0 +1,313 @@
+import os
+import json
+import mmap
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+class ChunkView:
+    """Lightweight view of one chunk in a ChunkStore, decoding its text and looking up its metadata only when accessed."""
+    __slots__ = ("_chunks", "chunk_id")
+
+    def __init__(self, chunks: "ChunkStore", chunk_id: int):
+        self._chunks = chunks
+        self.chunk_id = chunk_id
+
+    @property
+    def content(self) -> Optional[str]:
+        return self._chunks.text(self.chunk_id)
+
+    @property
+    def metadata(self) -> Optional[Dict]:
+        return self._chunks.metadata(self.chunk_id)
+
+class ChunkStore:
+    """
+    Columnar storage of chunks, indexed by chunk id:
+    texts as UTF-8 in one contiguous buffer plus an offsets array, metadata as ids into a table of unique dicts
+    (chunks of the same source share one entry), content hashes, token counts, and added/last-access times (NaN once evicted).
+    Chunks loaded from disk stay memory-mapped, chunks added afterwards go to an in-memory tail segment.
+    Evicted chunks keep their rows (and text bytes) until `compact` drops them and renumbers the rest.
+    """
+    def __init__(self):
+        # Memory-mapped segment (empty unless loaded from disk)
+        self._blob = b""
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._metadata_ids = np.zeros(0, dtype=np.int32)
+        self._hashes = np.zeros(0, dtype=np.uint64)
+
+        # In-memory segment of chunks added since loading
+        self._tail_blob = bytearray()
+        self._tail_offsets = array("q", [0])
+        self._tail_metadata_ids = array("i")
+        self._tail_hashes = array("Q")
+
+        self.metadata_table: List[Dict] = []
+        self._metadata_index: Dict[str, int] = {} # JSON key -> position in metadata_table
+        self.added_at = array("d")
+        self.last_access = array("d")
+        self.num_tokens = array("i") # Tokens of the encoder's tokenizer per chunk (-1 if not chunked by tokens)
+        self.text_bytes = 0 # UTF-8 bytes of resident chunk texts
+        self.wasted_bytes = 0 # Bytes of evicted chunk texts still in the buffers
+        self.num_removed = 0 # Evicted chunks whose rows are still in the columns
+
+    def __len__(self) -> int:
+        return len(self._metadata_ids) + len(self._tail_metadata_ids)
+
+    def __getitem__(self, chunk_id: int) -> ChunkView:
+        return ChunkView(self, chunk_id)
+
+    def __iter__(self):
+        for chunk_id in range(len(self)): yield ChunkView(self, chunk_id)
+
+    def is_resident(self, chunk_id: int) -> bool:
+        return self.added_at[chunk_id] == self.added_at[chunk_id] # False for NaN
+
+    def _span(self, chunk_id: int):
+        """Return (buffer, start, end) of a chunk's UTF-8 text."""
+        num_mapped = len(self._metadata_ids)
+        if chunk_id < num_mapped:
+            return self._blob, int(self._offsets[chunk_id]), int(self._offsets[chunk_id + 1])
+        chunk_id -= num_mapped
+        return self._tail_blob, self._tail_offsets[chunk_id], self._tail_offsets[chunk_id + 1]
+
+    def text(self, chunk_id: int) -> Optional[str]:
+        if not self.is_resident(chunk_id): return None
+        buffer, start, end = self._span(chunk_id)
+        return buffer[start:end].decode("utf-8")
+
+    def text_size(self, chunk_id: int) -> int:
+        """UTF-8 size of a chunk's text in bytes, without decoding it."""
+        _, start, end = self._span(chunk_id)
+        return end - start
+
+    def metadata(self, chunk_id: int) -> Optional[Dict]:
+        if not self.is_resident(chunk_id): return None
+        num_mapped = len(self._metadata_ids)
+        metadata_id = self._metadata_ids[chunk_id] if chunk_id < num_mapped else self._tail_metadata_ids[chunk_id - num_mapped]
+        return self.metadata_table[metadata_id]
+
+    def token_count(self, chunk_id: int) -> Optional[int]:
+        num_tokens = self.num_tokens[chunk_id]
+        return num_tokens if num_tokens >= 0 else None
+
+    def content_hash(self, chunk_id: int) -> int:
+        num_mapped = len(self._hashes)
+        return int(self._hashes[chunk_id]) if chunk_id < num_mapped else self._tail_hashes[chunk_id - num_mapped]
+
+    def resident_ids(self) -> np.ndarray:
+        return np.flatnonzero(~np.isnan(np.frombuffer(self.added_at, dtype=np.float64)))
+
+    def _intern(self, metadata: Dict) -> int:
+        key = _metadata_key(metadata)
+        if key not in self._metadata_index:
+            self._metadata_index[key] = len(self.metadata_table)
+            self.metadata_table.append(metadata)
+        return self._metadata_index[key]
+
+    def extend(self, texts: Iterable[str], metadata: Iterable[Dict], hashes: Iterable[int], added_at: float, num_tokens: Optional[Iterable[int]] = None):
+        """Append chunks (ids continue from len(self)), with their token counts if known."""
+        texts = list(texts)
+        self.num_tokens.extend(num_tokens if num_tokens is not None else [-1] * len(texts))
+        for text, meta, chunk_hash in zip(texts, metadata, hashes):
+            encoded = text.encode("utf-8")
+            self._tail_blob += encoded
+            self._tail_offsets.append(len(self._tail_blob))
+            self._tail_metadata_ids.append(self._intern(meta))
+            self._tail_hashes.append(chunk_hash)
+            self.added_at.append(added_at)
+            self.last_access.append(added_at)
+            self.text_bytes += len(encoded)
+
+    def remove(self, chunk_id: int):
+        """Mark a chunk as evicted (its text bytes are reclaimed by `compact`)."""
+        if not self.is_resident(chunk_id): return
+        size = self.text_size(chunk_id)
+        self.text_bytes -= size
+        self.wasted_bytes += size
+        self.num_removed += 1
+        self.added_at[chunk_id] = self.last_access[chunk_id] = np.nan
+
+    def compact(self) -> np.ndarray:
+        """
+        Drop evicted chunks from every column, renumbering the remaining chunks 0..n-1 in order,
+        rewrite their texts into one in-memory buffer, and drop metadata entries no chunk refers to anymore
+        *** returns ***
+        Old id of each remaining chunk (its new id is its position), to remap ids held elsewhere
+        """
+        kept = self.resident_ids()
+        blob, offsets = bytearray(), array("q", [0])
+        metadata_ids, hashes, metadata_table, metadata_index = array("i"), array("Q"), [], {}
+        for chunk_id in kept.tolist():
+            buffer, start, end = self._span(chunk_id)
+            blob += buffer[start:end]
+            offsets.append(len(blob))
+            metadata = self.metadata(chunk_id)
+            key = _metadata_key(metadata)
+            if key not in metadata_index:
+                metadata_index[key] = len(metadata_table)
+                metadata_table.append(metadata)
+            metadata_ids.append(metadata_index[key])
+            hashes.append(self.content_hash(chunk_id))
+
+        self._blob, self._offsets = b"", np.zeros(1, dtype=np.int64)
+        self._metadata_ids, self._hashes = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint64)
+        self._tail_blob, self._tail_offsets = blob, offsets
+        self._tail_metadata_ids, self._tail_hashes = metadata_ids, hashes
+        self.metadata_table, self._metadata_index = metadata_table, metadata_index
+        self.added_at = array("d", np.frombuffer(self.added_at, dtype=np.float64)[kept].tobytes())
+        self.last_access = array("d", np.frombuffer(self.last_access, dtype=np.float64)[kept].tobytes())
+        self.num_tokens = array("i", np.frombuffer(self.num_tokens, dtype=np.int32)[kept].tobytes())
+        self.wasted_bytes = 0
+        self.num_removed = 0
+        return kept
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the columns (texts, offsets, ids, hashes, token counts, times), excluding the metadata table."""
+        return len(self._blob) + len(self._tail_blob) + len(self) * (8 + 4 + 8 + 4 + 8 + 8)
+
+    def save(self, path: str):
+        """Write the columns to a directory (evicted chunks are stored as empty texts)."""
+        lengths = np.array([self.text_size(chunk_id) if self.is_resident(chunk_id) else 0 for chunk_id in range(len(self))], dtype=np.int64)
+        with open(os.path.join(path, "chunks.bin.tmp"), "wb") as f:
+            for chunk_id in range(len(self)):
+                if lengths[chunk_id] == 0: continue
+                buffer, start, end = self._span(chunk_id)
+                f.write(buffer[start:end])
+        save_npy(os.path.join(path, "chunk_offsets.npy"), np.concatenate([[0], np.cumsum(lengths)]))
+        save_npy(os.path.join(path, "metadata_ids.npy"), np.concatenate([self._metadata_ids, np.frombuffer(self._tail_metadata_ids, dtype=np.int32)]))
+        save_npy(os.path.join(path, "chunk_hashes.npy"), np.concatenate([self._hashes, np.frombuffer(self._tail_hashes, dtype=np.uint64)]))
+        save_npy(os.path.join(path, "chunk_tokens.npy"), np.frombuffer(self.num_tokens, dtype=np.int32))
+        save_npy(os.path.join(path, "chunk_times.npy"), np.array([self.added_at, self.last_access], dtype=np.float64))
+        with open(os.path.join(path, "metadata.json.tmp"), "w") as f:
+            json.dump(self.metadata_table, f, default=str) # Values JSON cannot represent are saved as strings
+
+        # Replace atomically, mapped readers of the old files keep their (unlinked) copy
+        os.replace(os.path.join(path, "chunks.bin.tmp"), os.path.join(path, "chunks.bin"))
+        os.replace(os.path.join(path, "metadata.json.tmp"), os.path.join(path, "metadata.json"))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ChunkStore":
+        """Load columns written by `save`, memory-mapping the text buffer, offsets, metadata ids and hashes if `mmap`."""
+        chunks = cls()
+        mmap_mode = "r" if mmap else None
+        blob_path = os.path.join(path, "chunks.bin")
+        if mmap:
+            chunks._blob = _map_file(blob_path)
+        else:
+            with open(blob_path, "rb") as f:
+                chunks._blob = f.read()
+        chunks._offsets = np.load(os.path.join(path, "chunk_offsets.npy"), mmap_mode=mmap_mode)
+        chunks._metadata_ids = np.load(os.path.join(path, "metadata_ids.npy"), mmap_mode=mmap_mode)
+        chunks._hashes = np.load(os.path.join(path, "chunk_hashes.npy"), mmap_mode=mmap_mode)
+        with open(os.path.join(path, "metadata.json")) as f:
+            chunks.metadata_table = json.load(f)
+        chunks._metadata_index = {_metadata_key(value): i for i, value in enumerate(chunks.metadata_table)}
+
+        # Times are updated on every retrieval, so they are read into memory
+        added_at, last_access = np.load(os.path.join(path, "chunk_times.npy")).reshape(2, -1)
+        chunks.added_at, chunks.last_access = array("d", added_at.tobytes()), array("d", last_access.tobytes())
+        tokens_path = os.path.join(path, "chunk_tokens.npy") # Missing in stores saved before token counts were kept
+        chunks.num_tokens = array("i", np.load(tokens_path).astype(np.int32).tobytes()) if os.path.exists(tokens_path) else array("i", [-1] * len(added_at))
+        chunks.text_bytes = int(chunks._offsets[-1])
+        chunks.num_removed = int(np.isnan(added_at).sum())
+        return chunks
+
+class ChunkIdIndex:
+    """
+    Map from chunk content hash to chunk id.
+    Entries loaded from disk stay memory-mapped as hash-sorted columns (looked up by binary search), so opening a large store
+    builds no dict; entries added afterwards go to an in-memory dict, and removed mapped entries are remembered in a set.
+    """
+    def __init__(self):
+        # Memory-mapped segment (empty unless loaded from disk)
+        self._hashes = np.zeros(0, dtype=np.uint64) # Sorted
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._removed: Set[int] = set() # Hashes of mapped entries removed since loading
+
+        self._tail: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._hashes) - len(self._removed) + len(self._tail)
+
+    def __contains__(self, chunk_hash: int) -> bool:
+        return self.get(chunk_hash) is not None
+
+    def __getitem__(self, chunk_hash: int) -> int:
+        chunk_id = self.get(chunk_hash)
+        if chunk_id is None: raise KeyError(chunk_hash)
+        return chunk_id
+
+    def __delitem__(self, chunk_hash: int):
+        if self._tail.pop(chunk_hash, None) is not None: return
+        if self._position(chunk_hash) < 0: raise KeyError(chunk_hash)
+        self._removed.add(chunk_hash)
+
+    def _position(self, chunk_hash: int) -> int:
+        """Position of a hash in the mapped columns, or -1."""
+        if len(self._hashes) == 0 or chunk_hash in self._removed: return -1
+        key = np.uint64(chunk_hash)
+        position = int(np.searchsorted(self._hashes, key))
+        return position if position < len(self._hashes) and self._hashes[position] == key else -1
+
+    def get(self, chunk_hash: int, default: Optional[int] = None) -> Optional[int]:
+        chunk_id = self._tail.get(chunk_hash)
+        if chunk_id is not None: return chunk_id
+        position = self._position(chunk_hash)
+        return int(self._ids[position]) if position >= 0 else default
+
+    def update(self, entries: Dict[int, int]):
+        self._tail.update(entries)
+
+    def _columns(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(hashes, ids) of every entry, sorted by hash."""
+        keep = ~np.isin(self._hashes, np.array(list(self._removed), dtype=np.uint64)) if self._removed else slice(None)
+        hashes = np.concatenate([self._hashes[keep], np.fromiter(self._tail.keys(), dtype=np.uint64, count=len(self._tail))])
+        ids = np.concatenate([self._ids[keep], np.fromiter(self._tail.values(), dtype=np.int64, count=len(self._tail))])
+        order = np.argsort(hashes, kind="stable")
+        return hashes[order], ids[order]
+
+    def remap(self, new_ids: np.ndarray):
+        """Renumber the ids (new_ids[old id] = new id), e.g. after the chunk store compacted them, keeping the entries in memory."""
+        self._hashes, ids = self._columns()
+        self._ids = new_ids[ids].astype(np.int64)
+        self._removed, self._tail = set(), {}
+
+    def save(self, path: str):
+        hashes, ids = self._columns()
+        save_npy(os.path.join(path, "chunk_id_hashes.npy"), hashes)
+        save_npy(os.path.join(path, "chunk_id_ids.npy"), ids)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> Optional["ChunkIdIndex"]:
+        """Load entries written by `save` (memory-mapped if `mmap`), or None if the store was saved without them."""
+        hashes_path = os.path.join(path, "chunk_id_hashes.npy")
+        if not os.path.exists(hashes_path): return None
+        index = cls()
+        index._hashes = np.load(hashes_path, mmap_mode="r" if mmap else None)
+        index._ids = np.load(os.path.join(path, "chunk_id_ids.npy"), mmap_mode="r" if mmap else None)
+        return index
+
+    @classmethod
+    def from_chunks(cls, chunks: ChunkStore) -> "ChunkIdIndex":
+        """Index the resident chunks of a chunk store by content hash."""
+        index = cls()
+        ids = chunks.resident_ids().astype(np.int64)
+        hashes = np.array([chunks.content_hash(chunk_id) for chunk_id in ids.tolist()], dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        index._hashes, index._ids = hashes[order], ids[order]
+        return index
+
+def _metadata_key(metadata: Dict) -> str:
+    """Key under which equal metadata dicts are interned (values JSON cannot represent, e.g. datetimes, are compared as strings)."""
+    return json.dumps(metadata, sort_keys=True, default=str)
+
+def _map_file(path: str):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) > 0 else b""
+
+def save_npy(path: str, values: np.ndarray):
+    """Write an array to a .npy file atomically (mapped readers of the old file keep their copy)."""
+    np.save(path + ".tmp.npy", values)
+    os.replace(path + ".tmp.npy", path)
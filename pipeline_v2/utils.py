@@ -1,8 +1,9 @@
 import random
 import re
 import json
+import bisect
 import subprocess
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 from termcolor import colored
 import time
 import traceback
@@ -23,6 +24,141 @@ def print_header(text: str, level: int = 0, decorator: str = '', decorator_len:
         attrs=attrs
     ))
     
+QUOTE_TRANSLATION = str.maketrans({"\u201c": '"', "\u201d": '"', "\u201e": '"', "\u00ab": '"', "\u00bb": '"', "\u2018": "'", "\u2019": "'"})
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query (case, quote style, whitespace, trailing punctuation) so trivially different queries share a key."""
+    query = query.translate(QUOTE_TRANSLATION).lower()
+    query = re.sub(r'"\s*([^"]*?)\s*"', r'"\1"', query) # Strip whitespace just inside quoted phrases
+    return " ".join(query.split()).rstrip("?.!")
+
+SENTENCE_BOUNDARY = re.compile(r'[.!?]\s+') # Sentence-ending punctuation and the whitespace after it (faster to scan for than a lookbehind)
+LEADING_WHITESPACE = re.compile(r'\s*')
+
+def sentence_offsets(text: str) -> Tuple[List[int], List[int]]:
+    """
+    Segments text into sentences once, without copying them.
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        tuple: Start offsets and end offsets of the non-empty sentences in text, with surrounding whitespace excluded
+    """
+    # Boundaries consume all whitespace between sentences, so only the text's own leading/trailing whitespace needs skipping
+    start = LEADING_WHITESPACE.match(text).end()
+    starts, ends = [start], []
+    for boundary in SENTENCE_BOUNDARY.finditer(text, start):
+        ends.append(boundary.start() + 1)
+        starts.append(boundary.end())
+    ends.append(len(text.rstrip()))
+    if starts[-1] >= ends[-1]: starts.pop(), ends.pop()
+    return starts, ends
+
+def iter_sentence_windows(starts: List[int], ends: List[int], max_size: int, max_overlap: int) -> Iterator[Tuple[int, int]]:
+    """
+    Slides a window over sentences given their start/end positions (characters, tokens or any other non-decreasing unit):
+    each window holds as many sentences as fit within max_size (at least one) and starts with the last sentences
+    of the previous window that fit within max_overlap. Boundaries are found by binary search, O(log n) per window.
+
+    Args:
+        starts (list): Start position of each sentence
+        ends (list): End position of each sentence
+        max_size (int): Maximum window size
+        max_overlap (int): Maximum overlap between windows
+
+    Yields:
+        tuple: (first, last) indices of the sentences in each window
+    """
+    first = 0 # First sentence of the current window
+    while first < len(starts):
+        # Extend the window with as many sentences as fit
+        last = max(bisect.bisect_right(ends, starts[first] + max_size) - 1, first)
+        yield first, last
+        if last + 1 == len(starts): return
+
+        # Next window starts with the last sentences that fit within max_overlap, dropping more until the next sentence fits
+        first = max(
+            bisect.bisect_left(starts, ends[last] - max_overlap, first, last + 1), 
+            bisect.bisect_left(starts, ends[last + 1] - max_size, first, last + 1)
+        )
+
+def iter_chunk_spans(text: str, max_chunk_size: int = 1000, max_overlap: int = 200) -> Iterator[Tuple[int, int]]:
+    """
+    Lazily chunks text into spans of at most max_chunk_size characters made of full sentences (a single longer sentence
+    becomes a chunk of its own), where each chunk starts with the last sentences of the previous one that fit within max_overlap.
+    Sentences are segmented once and chunk boundaries are found by binary search over their offsets,
+    so chunking is linear in the length of the text.
+
+    Args:
+        text (str): Input text
+        max_chunk_size (int): Maximum chunk size
+        max_overlap (int): Maximum overlap between chunks
+
+    Yields:
+        tuple: (start, end) offsets of each chunk in text (text[start:end] keeps the original whitespace and newlines)
+    """
+    starts, ends = sentence_offsets(text)
+    for first, last in iter_sentence_windows(starts, ends, max_chunk_size, max_overlap):
+        yield starts[first], ends[last]
+
+def token_chunk_spans(texts: List[str], tokenizer, max_tokens: int, max_overlap_tokens: int = 0) -> List[List[Tuple[int, int, int]]]:
+    """
+    Chunks texts into spans of at most max_tokens tokens made of full sentences, measuring length with a tokenizer
+    (e.g. the embedding model's, so no chunk is truncated by the encoder). All texts are tokenized in one batch;
+    sentences longer than max_tokens are split between words.
+
+    Args:
+        texts (list): Input texts
+        tokenizer: Hugging Face fast tokenizer (it must return offset mappings and must not truncate)
+        max_tokens (int): Maximum tokens per chunk, excluding special tokens
+        max_overlap_tokens (int): Maximum overlap between chunks in tokens
+
+    Returns:
+        list: (start, end, number of tokens) of each chunk, per text
+    """
+    encodings = tokenizer(
+        list(texts), 
+        add_special_tokens=False, 
+        return_offsets_mapping=True, 
+        return_attention_mask=False, 
+        return_token_type_ids=False, 
+        verbose=False
+    )
+    all_spans = []
+    for text, offsets in zip(texts, encodings["offset_mapping"]):
+        token_starts = [start for start, _ in offsets]
+        char_starts, char_ends, starts, ends = [], [], [], [] # Sentence pieces in characters and in token positions
+        for char_start, char_end in zip(*sentence_offsets(text)):
+            start, end = bisect.bisect_left(token_starts, char_start), bisect.bisect_left(token_starts, char_end)
+            while end - start > max_tokens:
+                # Cut before the last word starting within max_tokens (mid-word only if a single word is longer)
+                cut = start + max_tokens
+                while cut > start + 1 and not text[token_starts[cut] - 1].isspace(): cut -= 1
+                if cut == start + 1: cut = start + max_tokens
+                char_starts.append(char_start); char_ends.append(offsets[cut - 1][1]); starts.append(start); ends.append(cut)
+                start, char_start = cut, token_starts[cut]
+            char_starts.append(char_start); char_ends.append(char_end); starts.append(start); ends.append(end)
+        all_spans.append([
+            (char_starts[first], char_ends[last], ends[last] - starts[first])
+            for first, last in iter_sentence_windows(starts, ends, max_tokens, max_overlap_tokens)
+        ])
+    return all_spans
+
+def chunk_spans(text: str, max_chunk_size: int = 1000, max_overlap: int = 200) -> List[Tuple[int, int]]:
+    """
+    Chunks text into (start, end) spans, see iter_chunk_spans.
+
+    Args:
+        text (str): Input text
+        max_chunk_size (int): Maximum chunk size
+        max_overlap (int): Maximum overlap between chunks
+
+    Returns:
+        list: List of (start, end) offsets of the chunks in text
+    """
+    return list(iter_chunk_spans(text, max_chunk_size, max_overlap))
+
 def chunk_text(text: str, max_chunk_size: int = 1000, max_overlap: int = 200) -> List[str]:
     """
     Chunks text into segments of max_chunk_size, preserving full sentences and ensuring
@@ -36,36 +172,7 @@ def chunk_text(text: str, max_chunk_size: int = 1000, max_overlap: int = 200) ->
     Returns:
         list: List of text chunks
     """
-
-    # Split text into sentences
-    def _split_into_sentences(text): return re.split(r'(?<=[.!?])\s+', text)
-    sentences = _split_into_sentences(text)
-
-    # Iterate over each sentence to create chunks
-    chunks, current_chunk, overlap = [], "", ""
-    for sentence in sentences:
-        # Add sentence to the current chunk if it doesn't exceed max_chunk_size
-        if len(current_chunk) + len(sentence) <= max_chunk_size:
-            current_chunk += sentence + " "
-        else:
-            # Else add the current chunk to the list and start a new one
-            chunks.append(current_chunk.strip())
-
-            # Create overlap by taking the last sentences from the current chunk that fit within max_overlap
-            overlap = ""
-            chunk_sentences = _split_into_sentences(current_chunk)
-            for s in reversed(chunk_sentences):
-                if len(overlap) + len(s) > max_overlap:
-                    break
-                overlap = s + " " + overlap
-            
-            # Start new chunk with overlap and the new sentence
-            current_chunk = overlap + sentence + " "
-
-    # Add the last chunk if it's not empty
-    if current_chunk.strip(): chunks.append(current_chunk.strip())
-
-    return chunks
+    return [text[start:end] for start, end in iter_chunk_spans(text, max_chunk_size, max_overlap)]
 
 def retry_function(func, *args, max_retries=5, retry_delay=2, **kwargs):
     """
@@ -1,8 +1,20 @@
-from sentence_transformers import SentenceTransformer
+import os
+import sys
+
 from sentence_transformers.util import cos_sim
 
-# Load Sentence Transformer model for sentence/example similarity
-sentence_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+# Share the process-wide encoder registry of pipeline_v2 (imported as `encoders`, like pipeline_v2's own modules do, so there is one registry)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pipeline_v2"))
+from encoders import get_encoder
+
+def get_sentence_model():
+    """
+    Returns the sentence similarity model, loading it once on first call.
+
+    Returns:
+        SentenceTransformer: The model shared with every other user of all-MiniLM-L6-v2 in the process.
+    """
+    return get_encoder('sentence-transformers/all-MiniLM-L6-v2')
 
 def select_best_examples(input, examples, example_key, num_examples=3):
     """
@@ -21,6 +33,7 @@ def select_best_examples(input, examples, example_key, num_examples=3):
     example_inputs = [example[example_key] for example in examples]
 
     # Calculate sentence embeddings for the input sentence and the examples
+    sentence_model = get_sentence_model()
     input_embeddings = sentence_model.encode(input)
     example_embeddings = sentence_model.encode(example_inputs)
 
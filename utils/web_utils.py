@@ -2,6 +2,9 @@ import re
 import requests
 from bs4 import BeautifulSoup
 
+# Shared session, so repeated scrapes reuse connections (keep-alive) instead of reconnecting for every URL
+session = requests.Session()
+
 def extract_website_name(url):
     """Extracts the website name from a given URL using regex"""
     match = re.search(r'(?P<url>https?://[^\s]+)', url)
@@ -10,10 +13,10 @@ def extract_website_name(url):
         return url.split('//')[1].split('/')[0].lower().replace('www.', '')
     return None
 
-def scrape_text_from_website(url):
+def scrape_text_from_website(url, timeout=5):
     """Scrapes text and metadata from a given website URL."""
     try:
-        response = requests.get(url, timeout=5)
+        response = session.get(url, timeout=timeout)
         if response.status_code == 200:
             soup = BeautifulSoup(response.content, 'html.parser')
 